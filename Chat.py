@@ -1,12 +1,18 @@
 import socket
 import sys
 import os
+import time
 from dotenv import load_dotenv
 
 try:
-    from DES_Chat import des_encrypt, des_decrypt, bits_to_hex, hex_to_bits
-except ImportError:
-    print("Error: DES_Chat.py not found.")
+    from ChatProtocol import (announce_capabilities, negotiate_format, encrypt_message,
+                              recv_message, decrypt_payload, describe_payload,
+                              announce_session, expect_session)
+    from ChatSession import ChatSession, listen_socket, connect_socket
+    from ChatBroadcast import parse_peers, broadcast, format_status, BROADCAST_TIMEOUT
+    from ChatFile import send_file, receive_file
+except ImportError as e:
+    print(f"Error: {e}")
     sys.exit(1)
 
 try:
@@ -22,6 +28,9 @@ except FileNotFoundError:
 LHOST = os.getenv("LHOST")
 RHOST = os.getenv("RHOST")
 PORT = int(os.getenv("PORT", 8080))
+COMPRESSION = os.getenv("COMPRESSION", "zlib")
+PEERS = os.getenv("PEERS", "")
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", ".")
 
 def get_key():
     key = ""
@@ -40,19 +49,20 @@ def sender_mode(key):
             print("Connection successful!")
             
             s.settimeout(None)
+            wire_format = negotiate_format(s, compression=COMPRESSION)
+            print(f"Using {wire_format} wire format.")
 
             print("======================================================")
             plaintext = input("Enter message: ")
             print("======================================================")
             
-            encrypted_bits = des_encrypt(plaintext, key)
-            encrypted_hex = bits_to_hex(encrypted_bits)
+            payload = encrypt_message(plaintext, key, wire_format)
 
             print("======================================================")
-            print(f"Encrypted message (hex): {encrypted_hex}")
+            print(f"Encrypted message (hex): {describe_payload(payload)}")
             print("======================================================")
             
-            s.sendall(encrypted_hex.encode('utf-8'))
+            s.sendall(payload)
             print("Message sent. Disconnecting.")
             
     except socket.timeout:
@@ -64,6 +74,52 @@ def sender_mode(key):
     finally:
         print("Returning to menu...\n")
 
+def send_file_mode(key):
+    try:
+        path = input("Enter the path of the file to send: ").strip()
+        if not os.path.isfile(path):
+            print(f"Error: {path} is not a file.")
+            return
+
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(5)
+            print(f"Attempting to connect to {RHOST}:{PORT}...")
+            s.connect((RHOST, PORT))
+            print("Connection successful!")
+            s.settimeout(None)
+
+            wire_format = negotiate_format(s)
+            if not wire_format.startswith('binary'):
+                print("Error: The receiver only speaks hex, so it can't take files.")
+                return
+
+            print(f"Sending {path} ({os.path.getsize(path):,} bytes)...")
+            summary = send_file(s, path, key)
+            print(f"Sent {summary['bytes']:,} bytes in {summary['seconds']:.2f}s "
+                  f"({summary['mb_per_s']:.2f} MB/s).")
+            print(f"Receiver verified the file (SHA-256 {summary['sha256']}).")
+
+    except socket.timeout:
+        print(f"Error: Connection timed out. Is the receiver listening on {RHOST}:{PORT}?")
+    except ConnectionRefusedError:
+        print(f"Error: Connection refused. Is the receiver running on {RHOST}:{PORT}?")
+    except Exception as e:
+        print(f"An error occurred while sending the file: {e}")
+    finally:
+        print("Returning to menu...\n")
+
+def receive_file_from(conn, header, key):
+    print("======================================================")
+    try:
+        summary = receive_file(conn, header, key, DOWNLOAD_DIR)
+        print(f"Saved {summary['path']}: {summary['bytes']:,} bytes in {summary['seconds']:.2f}s "
+              f"({summary['mb_per_s']:.2f} MB/s).")
+        print(f"Integrity check passed (SHA-256 {summary['sha256']}).")
+    except Exception as e:
+        print(f"--- File transfer failed ---")
+        print(f"Error: {e}")
+    print("======================================================")
+
 def receiver_mode(key):
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
@@ -79,24 +135,23 @@ def receiver_mode(key):
             
             with conn:
                 print(f"Connected by {addr}")
+                announce_capabilities(conn)
                 print("Waiting for one message...")
                 
-                data = conn.recv(4096)
-                if data:
-                    encrypted_hex = data.decode('utf-8').strip()
-
+                wire_format, data = recv_message(conn)
+                if wire_format == 'file':
+                    receive_file_from(conn, data, key)
+                elif data:
                     print("======================================================")
-                    print(f"Encrypted message (hex) received: {encrypted_hex}")
                     
                     try:
-                        encrypted_bits = hex_to_bits(encrypted_hex)
-                        decrypted_text = des_decrypt(encrypted_bits, key)
-                        
+                        encrypted_hex, decrypted_text = decrypt_payload(wire_format, data, key)
+                        print(f"Encrypted message ({wire_format}) received: {encrypted_hex}")
                         print(f"Received message: {decrypted_text}")
                     except Exception as e:
                         print(f"--- Error decrypting message ---")
                         print(f"Error: {e}. Was the key correct?")
-                        print(f"Raw data received: {encrypted_hex}")
+                        print(f"Raw data received: {bytes(data)!r}")
                         print(f"---------------------------------")
                     print("======================================================")
                 else:
@@ -116,6 +171,91 @@ def receiver_mode(key):
         print("Returning to menu...\n")
 
 
+def choose_session_role():
+    role = ""
+    while role not in ("h", "j"):
+        role = input("Host the session or join your partner's? (h/j): ").strip().lower()
+    return role
+
+def session_mode(key):
+    role = choose_session_role()
+    listener = None
+    try:
+        if role == "h":
+            listener = listen_socket(LHOST, PORT)
+            print(f"Session host listening on {LHOST}:{PORT}...")
+
+            def open_connection():
+                conn, addr = listener.accept()
+                print(f"Connected by {addr}")
+                return conn
+
+            def handshake(conn):
+                announce_session(conn)
+                return key
+        else:
+            def open_connection():
+                print(f"Connecting to {RHOST}:{PORT}...")
+                return connect_socket(RHOST, PORT)
+
+            def handshake(sock):
+                expect_session(sock)
+                return key
+
+        ChatSession(open_connection, handshake).run()
+
+    except OSError as e:
+        if e.errno == 98: 
+            print(f"Error: Address {LHOST}:{PORT} is already in use.")
+        else:
+            print(f"An error occurred in session mode: {e}")
+    except Exception as e:
+        print(f"An error occurred in session mode: {e}")
+    finally:
+        if listener is not None:
+            listener.close()
+        print("Returning to menu...\n")
+
+
+def get_peers():
+    while True:
+        text = PEERS or input(f"Enter peers (host[:port], comma separated; default port {PORT}): ")
+        try:
+            return parse_peers(text, PORT)
+        except ValueError as e:
+            print(f"Error: {e}")
+            if PEERS:
+                return None
+
+def broadcast_mode(key):
+    try:
+        peers = get_peers()
+        if peers is None:
+            return
+
+        print("======================================================")
+        plaintext = input("Enter message: ")
+        print("======================================================")
+
+        def handshake(s):
+            return key, negotiate_format(s, compression=COMPRESSION)
+
+        print(f"Sending to {len(peers)} peers...")
+        start = time.monotonic()
+        statuses, encryptions = broadcast(peers, plaintext, handshake, BROADCAST_TIMEOUT)
+        elapsed = time.monotonic() - start
+        for status in statuses:
+            print(format_status(status))
+        delivered = sum(status['ok'] for status in statuses)
+        print(f"Sent to {delivered}/{len(peers)} peers in {elapsed:.2f}s "
+              f"({encryptions} encryption{'s' if encryptions != 1 else ''}).")
+
+    except Exception as e:
+        print(f"An error occurred in broadcast mode: {e}")
+    finally:
+        print("Returning to menu...\n")
+
+
 def main():    
     key = get_key()
     
@@ -123,9 +263,12 @@ def main():
         print("Choose your role for this turn:")
         print("1. Sender (Send one message)")
         print("2. Receiver (Receive one message)")
-        print("3. Quit")
+        print("3. Session (Keep chatting on one connection)")
+        print("4. Broadcast (Send one message to many receivers)")
+        print("5. Send file (Stream a file to the receiver)")
+        print("6. Quit")
         
-        choice = input("Enter choice (1, 2, or 3): ")
+        choice = input("Enter choice (1, 2, 3, 4, 5, or 6): ")
             
         if choice == '1':
             print("\nStarting in Sender mode...")
@@ -134,10 +277,19 @@ def main():
             print("\nStarting in Receiver mode...")
             receiver_mode(key)
         elif choice == '3':
+            print("\nStarting in Session mode...")
+            session_mode(key)
+        elif choice == '4':
+            print("\nStarting in Broadcast mode...")
+            broadcast_mode(key)
+        elif choice == '5':
+            print("\nStarting in Send file mode...")
+            send_file_mode(key)
+        elif choice == '6':
             print("Exiting chat. Goodbye!")
             break 
         else:
-            print("Invalid input. Please enter 1, 2, or 3.\n")
+            print("Invalid input. Please enter 1, 2, 3, 4, 5, or 6.\n")
 
 if __name__ == "__main__":
     main()
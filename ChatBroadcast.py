@@ -0,0 +1,87 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ChatProtocol import encrypt_message
+
+# One message to many receivers. Every peer gets the same key (the shared
+# chat key, or a group key sent to each peer under its RSA key), so the
+# ciphertext is built once per wire format the peers negotiate, usually
+# just once, and the sends run concurrently.
+
+BROADCAST_TIMEOUT = 10.0
+MAX_BROADCAST_WORKERS = 32
+
+
+def parse_peers(text, default_port):
+    # "host[:port], host[:port] ..." -> [(host, port)]
+    peers = []
+    for item in text.replace(",", " ").split():
+        host, _, port = item.rpartition(":")
+        if not host:
+            host, port = port, ""
+        try:
+            peers.append((host, int(port) if port else default_port))
+        except ValueError:
+            raise ValueError(f"Bad port in peer {item!r}.")
+    if not peers:
+        raise ValueError("No peers given.")
+    return peers
+
+
+class PayloadCache:
+    # Encrypts each (key, wire_format) once; peers that negotiate the same
+    # format share the bytes.
+    def __init__(self, plaintext):
+        self.plaintext = plaintext
+        self.payloads = {}
+        self.encryptions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, wire_format):
+        with self.lock:
+            payload = self.payloads.get((key, wire_format))
+            if payload is None:
+                payload = bytes(encrypt_message(self.plaintext, key, wire_format))
+                self.payloads[(key, wire_format)] = payload
+                self.encryptions += 1
+            return payload
+
+
+def send_to_peer(peer, payloads, handshake, timeout):
+    # handshake(sock) -> (key, wire_format), or None if the peer left.
+    start = time.monotonic()
+    status = {'peer': peer, 'ok': False, 'wire_format': None, 'error': None}
+    try:
+        with socket.create_connection(peer, timeout=timeout) as s:
+            # The timeout applies to each step, so a stalled peer can't hold
+            # its worker for longer than that.
+            result = handshake(s)
+            if result is None:
+                raise ConnectionError("Peer left during the handshake.")
+            key, wire_format = result
+            status['wire_format'] = wire_format
+            s.sendall(payloads.get(key, wire_format))
+            status['ok'] = True
+    except socket.timeout:
+        status['error'] = f"timed out after {timeout:g}s"
+    except Exception as e:
+        status['error'] = str(e) or type(e).__name__
+    status['seconds'] = time.monotonic() - start
+    return status
+
+def broadcast(peers, plaintext, handshake, timeout=BROADCAST_TIMEOUT,
+              workers=MAX_BROADCAST_WORKERS):
+    # Returns (per-peer statuses in `peers` order, encryptions done).
+    payloads = PayloadCache(plaintext)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(peers)))) as executor:
+        statuses = list(executor.map(lambda peer: send_to_peer(peer, payloads, handshake, timeout),
+                                     peers))
+    return statuses, payloads.encryptions
+
+def format_status(status):
+    host, port = status['peer']
+    if status['ok']:
+        return f"{host}:{port} sent ({status['wire_format']}, {status['seconds'] * 1e3:.1f} ms)"
+    return f"{host}:{port} FAILED: {status['error']} ({status['seconds'] * 1e3:.1f} ms)"
@@ -1,14 +1,26 @@
 import socket
 import sys
 import os
+import time
 from dotenv import load_dotenv
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization, hashes
 
 try:
-    from DES_Chat import des_encrypt, des_decrypt, bits_to_hex, hex_to_bits
-except ImportError:
-    print("Error: DES_Chat.py not found.")
+    from ChatProtocol import (announce_capabilities, encrypt_message,
+                              recv_message, decrypt_payload, describe_payload, send_frame,
+                              recv_frame, recv_exact, recv_until, announce_session,
+                              expect_session, read_greeting, format_from_greeting,
+                              FRAME_HANDSHAKE, PEM_END_MARKER, WIRE_FORMATS)
+    from ChatSession import ChatSession, listen_socket, connect_socket
+    from RSAKeyManager import RSAKeyManager
+    from SessionCache import (SessionCache, new_session_id, make_resume_request,
+                              parse_resume_request, session_word, session_id_from_words,
+                              RESUMED_WORD, RESUME_FAILED_WORD)
+    from ChatBroadcast import parse_peers, broadcast, format_status, BROADCAST_TIMEOUT
+    from ChatFile import send_file, receive_file
+except ImportError as e:
+    print(f"Error: {e}")
     sys.exit(1)
 
 try:
@@ -24,6 +36,19 @@ except FileNotFoundError:
 LHOST = os.getenv("LHOST")
 RHOST = os.getenv("RHOST")
 PORT = int(os.getenv("PORT", 8080))
+RSA_KEY_FILE = os.getenv("RSA_KEY_FILE") or None
+COMPRESSION = os.getenv("COMPRESSION", "zlib")
+PEERS = os.getenv("PEERS", "")
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", ".")
+
+# Keypairs are generated in the background and handed out on demand, so the
+# receiver can listen right away.
+key_manager = RSAKeyManager(key_path=RSA_KEY_FILE)
+
+# DES keys from completed exchanges: the receiver's by session ID, the
+# sender's by receiver address, so repeat connections can skip RSA.
+server_sessions = SessionCache()
+client_sessions = SessionCache()
 
 def get_key():
     key = ""
@@ -33,6 +58,70 @@ def get_key():
             print("Error: The key must be exactly 8 characters long. Please try again.")
     return key
 
+def sender_handshake(s, peer=None, log=print, compression=None, group_key=None):
+    # Runs the sender side of the one-shot key exchange on a connected
+    # socket; returns (key, wire_format), or None if the receiver left.
+    # `peer` keys the session cache (None disables resumption), and
+    # `compression` is the codec to use if the receiver offers it.
+    # `group_key` (8 bytes) is sent instead of a fresh random key, so one
+    # ciphertext can go to several receivers; it is never resumed.
+    log("Receiving public key from receiver...")
+    public_pem = recv_until(s, PEM_END_MARKER)
+    if PEM_END_MARKER not in public_pem:
+        log("Receiver disconnected before sending public key.")
+        return None
+
+    public_key = serialization.load_pem_public_key(public_pem)
+    log("Public key received.")
+    block_size = public_key.key_size // 8
+
+    key = None
+    cached = client_sessions.get(peer) if peer is not None and group_key is None else None
+    if cached is not None:
+        session_id, des_key_bytes = cached
+        log("Resuming cached session (skipping RSA)...")
+        s.sendall(make_resume_request(session_id, block_size))
+        # This receiver has handed out a session, so it will answer; give up
+        # early and the two sides would disagree on the key.
+        words = read_greeting(s, s.gettimeout())
+        if not words:
+            log("Receiver did not answer the resume request.")
+            return None
+        if RESUMED_WORD in words:
+            key = des_key_bytes.decode('latin-1')
+            log("Session resumed.")
+        else:
+            client_sessions.remove(peer)
+            log("Receiver no longer knows this session; doing a full key exchange.")
+
+    if key is None:
+        if group_key is not None:
+            des_key_bytes = group_key
+            log("Using the broadcast group key.")
+        else:
+            des_key_bytes = os.urandom(8)
+            log("Generated random 8-byte DES key.")
+        key = des_key_bytes.decode('latin-1')
+
+        log("Encrypting DES key for secure transport...")
+        encrypted_des_key = public_key.encrypt(
+            des_key_bytes,
+            padding.OAEP(
+                mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None
+            )
+        )
+
+        s.sendall(encrypted_des_key)
+        log("Secure DES key sent.")
+        words = read_greeting(s)
+        session_id = session_id_from_words(words)
+        if session_id is not None and peer is not None and group_key is None:
+            client_sessions.put(peer, (session_id, des_key_bytes))
+
+    return key, format_from_greeting(words, compression)
+
 def sender_mode():
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
@@ -42,45 +131,23 @@ def sender_mode():
             print("Connection successful!")
             s.settimeout(None)
 
-            print("Receiving public key from receiver...")
-            public_pem = s.recv(4096)
-            if not public_pem:
-                print("Receiver disconnected before sending public key.")
+            result = sender_handshake(s, (RHOST, PORT), compression=COMPRESSION)
+            if result is None:
                 return
-
-            public_key = serialization.load_pem_public_key(public_pem)
-            print("Public key received.")
-
-            des_key_bytes = os.urandom(8)
-            
-            key = des_key_bytes.decode('latin-1')
-            print("Generated random 8-byte DES key.")
-
-            print("Encrypting DES key for secure transport...")
-            encrypted_des_key = public_key.encrypt(
-                des_key_bytes,
-                padding.OAEP(
-                    mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                    algorithm=hashes.SHA256(),
-                    label=None
-                )
-            )
-
-            s.sendall(encrypted_des_key)
-            print("Secure DES key sent.")
+            key, wire_format = result
+            print(f"Using {wire_format} wire format.")
 
             print("======================================================")
             plaintext = input("Enter message: ")
             print("======================================================")
             
-            encrypted_bits = des_encrypt(plaintext, key) 
-            encrypted_hex = bits_to_hex(encrypted_bits)
+            payload = encrypt_message(plaintext, key, wire_format)
 
             print("======================================================")
-            print(f"Encrypted message (hex): {encrypted_hex}")
+            print(f"Encrypted message (hex): {describe_payload(payload)}")
             print("======================================================")
             
-            s.sendall(encrypted_hex.encode('utf-8'))
+            s.sendall(payload)
             print("Message sent. Disconnecting.")
 
     except socket.timeout:
@@ -92,19 +159,104 @@ def sender_mode():
     finally:
         print("Returning to menu...\n")
 
-def receiver_mode(): 
-    try:
-        print("Generating RSA key pair (this may take a moment)...")
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-        )
-        public_key = private_key.public_key()
+def receiver_handshake(conn, private_key, public_pem, formats=WIRE_FORMATS, log=print):
+    # Runs the receiver side of the one-shot key exchange; returns the DES
+    # key, or None if the sender left.
+    log("Sending public key to sender...")
+    conn.sendall(public_pem)
+
+    log("Waiting for encrypted DES key...")
+    # Exactly one RSA block, so the read never runs into the message.
+    block_size = private_key.key_size // 8
+    encrypted_des_key = recv_exact(conn, block_size)
+    if encrypted_des_key is None:
+        log("Sender disconnected before sending DES key.")
+        return None
 
-        public_pem = public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
+    des_key_bytes = None
+    session_id = parse_resume_request(encrypted_des_key)
+    if session_id is not None:
+        des_key_bytes = server_sessions.get(session_id)
+        if des_key_bytes is not None:
+            log("Sender resumed a cached session; skipping RSA.")
+            announce_capabilities(conn, [RESUMED_WORD], formats)
+        else:
+            log("Unknown or expired session; asking for a full key exchange.")
+            announce_capabilities(conn, [RESUME_FAILED_WORD], formats)
+            encrypted_des_key = recv_exact(conn, block_size)
+            if encrypted_des_key is None:
+                log("Sender disconnected before sending DES key.")
+                return None
+
+    if des_key_bytes is None:
+        log("Decrypting DES key...")
+        des_key_bytes = private_key.decrypt(
+            bytes(encrypted_des_key),
+            padding.OAEP(
+                mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None
+            )
         )
+        session_id = new_session_id()
+        server_sessions.put(session_id, des_key_bytes)
+        announce_capabilities(conn, [session_word(session_id)], formats)
+    
+    log("Secure DES key established.")
+    return des_key_bytes.decode('latin-1')
+
+def send_file_mode():
+    try:
+        path = input("Enter the path of the file to send: ").strip()
+        if not os.path.isfile(path):
+            print(f"Error: {path} is not a file.")
+            return
+
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(10)
+            print(f"Attempting to connect to {RHOST}:{PORT}...")
+            s.connect((RHOST, PORT))
+            print("Connection successful!")
+            s.settimeout(None)
+
+            result = sender_handshake(s, (RHOST, PORT))
+            if result is None:
+                return
+            key, wire_format = result
+            if not wire_format.startswith('binary'):
+                print("Error: The receiver only speaks hex, so it can't take files.")
+                return
+
+            print(f"Sending {path} ({os.path.getsize(path):,} bytes)...")
+            summary = send_file(s, path, key)
+            print(f"Sent {summary['bytes']:,} bytes in {summary['seconds']:.2f}s "
+                  f"({summary['mb_per_s']:.2f} MB/s).")
+            print(f"Receiver verified the file (SHA-256 {summary['sha256']}).")
+
+    except socket.timeout:
+        print(f"Error: Connection timed out. Is the receiver listening on {RHOST}:{PORT}?")
+    except ConnectionRefusedError:
+        print(f"Error: Connection refused. Is the receiver running on {RHOST}:{PORT}?")
+    except Exception as e:
+        print(f"An error occurred while sending the file: {e}")
+    finally:
+        print("Returning to menu...\n")
+
+def receive_file_from(conn, header, key):
+    print("======================================================")
+    try:
+        summary = receive_file(conn, header, key, DOWNLOAD_DIR)
+        print(f"Saved {summary['path']}: {summary['bytes']:,} bytes in {summary['seconds']:.2f}s "
+              f"({summary['mb_per_s']:.2f} MB/s).")
+        print(f"Integrity check passed (SHA-256 {summary['sha256']}).")
+    except Exception as e:
+        print(f"--- File transfer failed ---")
+        print(f"Error: {e}")
+    print("======================================================")
+
+def receiver_mode(): 
+    try:
+        private_key, public_pem = key_manager.acquire()
 
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -118,43 +270,25 @@ def receiver_mode():
             with conn:
                 print(f"Connected by {addr}")
 
-                print("Sending public key to sender...")
-                conn.sendall(public_pem)
-
-                print("Waiting for encrypted DES key...")
-                encrypted_des_key = conn.recv(1024)
-                if not encrypted_des_key:
-                    print("Sender disconnected before sending DES key.")
+                key = receiver_handshake(conn, private_key, public_pem)
+                if key is None:
                     return
 
-                print("Decrypting DES key...")
-                des_key_bytes = private_key.decrypt(
-                    encrypted_des_key,
-                    padding.OAEP(
-                        mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                        algorithm=hashes.SHA256(),
-                        label=None
-                    )
-                )
-                
-                key = des_key_bytes.decode('latin-1') 
-                print("Secure DES key established.")
-
                 print("Waiting for one message...")
-                data = conn.recv(4096)
-                if data:
-                    encrypted_hex = data.decode('utf-8').strip()
+                wire_format, data = recv_message(conn)
+                if wire_format == 'file':
+                    receive_file_from(conn, data, key)
+                elif data:
                     print("======================================================")
-                    print(f"Encrypted message (hex) received: {encrypted_hex}")
                     
                     try:
-                        encrypted_bits = hex_to_bits(encrypted_hex)
-                        decrypted_text = des_decrypt(encrypted_bits, key) 
+                        encrypted_hex, decrypted_text = decrypt_payload(wire_format, data, key)
+                        print(f"Encrypted message ({wire_format}) received: {encrypted_hex}")
                         print(f"Received message: {decrypted_text}")
                     except Exception as e:
                         print(f"--- Error decrypting message ---")
                         print(f"Error: {e}. Key exchange might have failed.")
-                        print(f"Raw data received: {encrypted_hex}")
+                        print(f"Raw data received: {bytes(data)!r}")
                         print(f"---------------------------------")
                     print("======================================================")
                 else:
@@ -174,16 +308,177 @@ def receiver_mode():
         print("Returning to menu...\n")
 
 
+def choose_session_role():
+    role = ""
+    while role not in ("h", "j"):
+        role = input("Host the session or join your partner's? (h/j): ").strip().lower()
+    return role
+
+def session_mode():
+    role = choose_session_role()
+    listener = None
+    try:
+        if role == "h":
+            listener = listen_socket(LHOST, PORT)
+            print(f"Session host listening on {LHOST}:{PORT}...")
+
+            def open_connection():
+                conn, addr = listener.accept()
+                print(f"Connected by {addr}")
+                return conn
+
+            def handshake(conn):
+                announce_session(conn)
+                private_key, public_pem = key_manager.acquire()
+                send_frame(conn, FRAME_HANDSHAKE, public_pem)
+
+                frame = recv_frame(conn)
+                if frame is None or frame[0] != FRAME_HANDSHAKE:
+                    raise ConnectionError("Partner disconnected before sending DES key.")
+
+                session_id = parse_resume_request(frame[1])
+                if session_id is not None:
+                    des_key_bytes = server_sessions.get(session_id)
+                    if des_key_bytes is not None:
+                        send_frame(conn, FRAME_HANDSHAKE, RESUMED_WORD)
+                        print("Partner resumed a cached session; skipping RSA.")
+                        return des_key_bytes
+                    send_frame(conn, FRAME_HANDSHAKE, RESUME_FAILED_WORD)
+                    frame = recv_frame(conn)
+                    if frame is None or frame[0] != FRAME_HANDSHAKE:
+                        raise ConnectionError("Partner disconnected before sending DES key.")
+
+                des_key_bytes = private_key.decrypt(
+                    frame[1],
+                    padding.OAEP(
+                        mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                        algorithm=hashes.SHA256(),
+                        label=None
+                    )
+                )
+                session_id = new_session_id()
+                server_sessions.put(session_id, des_key_bytes)
+                send_frame(conn, FRAME_HANDSHAKE, session_word(session_id))
+                print("Secure DES key established.")
+                return des_key_bytes
+        else:
+            def open_connection():
+                print(f"Connecting to {RHOST}:{PORT}...")
+                return connect_socket(RHOST, PORT, timeout=10)
+
+            def handshake(sock):
+                expect_session(sock)
+                frame = recv_frame(sock)
+                if frame is None or frame[0] != FRAME_HANDSHAKE:
+                    raise ConnectionError("Partner disconnected before sending public key.")
+                public_key = serialization.load_pem_public_key(frame[1])
+                peer = (RHOST, PORT)
+
+                cached = client_sessions.get(peer)
+                if cached is not None:
+                    session_id, des_key_bytes = cached
+                    send_frame(sock, FRAME_HANDSHAKE,
+                               make_resume_request(session_id, public_key.key_size // 8))
+                    reply = recv_frame(sock)
+                    if reply is not None and reply[1] == RESUMED_WORD:
+                        print("Session resumed (skipped RSA).")
+                        return des_key_bytes
+                    client_sessions.remove(peer)
+
+                des_key_bytes = os.urandom(8)
+                encrypted_des_key = public_key.encrypt(
+                    des_key_bytes,
+                    padding.OAEP(
+                        mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                        algorithm=hashes.SHA256(),
+                        label=None
+                    )
+                )
+                send_frame(sock, FRAME_HANDSHAKE, encrypted_des_key)
+                reply = recv_frame(sock)
+                if reply is None:
+                    raise ConnectionError("Partner disconnected during key exchange.")
+                session_id = session_id_from_words(reply[1].split())
+                if session_id is not None:
+                    client_sessions.put(peer, (session_id, des_key_bytes))
+                print("Secure DES key established.")
+                return des_key_bytes
+
+        ChatSession(open_connection, handshake).run()
+
+    except OSError as e:
+        if e.errno == 98: 
+            print(f"Error: Address {LHOST}:{PORT} is already in use.")
+        else:
+            print(f"An error occurred in session mode: {e}")
+    except Exception as e:
+        print(f"An error occurred in session mode: {e}")
+    finally:
+        if listener is not None:
+            listener.close()
+        print("Returning to menu...\n")
+
+
+def get_peers():
+    while True:
+        text = PEERS or input(f"Enter peers (host[:port], comma separated; default port {PORT}): ")
+        try:
+            return parse_peers(text, PORT)
+        except ValueError as e:
+            print(f"Error: {e}")
+            if PEERS:
+                return None
+
+def quiet(*args, **kwargs):
+    pass
+
+def broadcast_mode():
+    try:
+        peers = get_peers()
+        if peers is None:
+            return
+
+        print("======================================================")
+        plaintext = input("Enter message: ")
+        print("======================================================")
+
+        # Each receiver still gets the key under its own RSA key; only the
+        # message is encrypted once.
+        group_key = os.urandom(8)
+
+        def handshake(s):
+            return sender_handshake(s, log=quiet, compression=COMPRESSION, group_key=group_key)
+
+        print(f"Sending to {len(peers)} peers...")
+        start = time.monotonic()
+        statuses, encryptions = broadcast(peers, plaintext, handshake, BROADCAST_TIMEOUT)
+        elapsed = time.monotonic() - start
+        for status in statuses:
+            print(format_status(status))
+        delivered = sum(status['ok'] for status in statuses)
+        print(f"Sent to {delivered}/{len(peers)} peers in {elapsed:.2f}s "
+              f"({encryptions} encryption{'s' if encryptions != 1 else ''}).")
+
+    except Exception as e:
+        print(f"An error occurred in broadcast mode: {e}")
+    finally:
+        print("Returning to menu...\n")
+
+
 def main():    
     # key = get_key()
+    key_manager.start()
     
     while True:
         print("Choose your role for this turn:")
         print("1. Sender (Send one message)")
         print("2. Receiver (Receive one message)")
-        print("3. Quit")
+        print("3. Session (Keep chatting on one connection)")
+        print("4. Broadcast (Send one message to many receivers)")
+        print("5. Send file (Stream a file to the receiver)")
+        print("6. Quit")
         
-        choice = input("Enter choice (1, 2, or 3): ")
+        choice = input("Enter choice (1, 2, 3, 4, 5, or 6): ")
             
         if choice == '1':
             print("\nStarting in Sender mode...")
@@ -192,10 +487,19 @@ def main():
             print("\nStarting in Receiver mode...")
             receiver_mode()
         elif choice == '3':
+            print("\nStarting in Session mode...")
+            session_mode()
+        elif choice == '4':
+            print("\nStarting in Broadcast mode...")
+            broadcast_mode()
+        elif choice == '5':
+            print("\nStarting in Send file mode...")
+            send_file_mode()
+        elif choice == '6':
             print("Exiting chat. Goodbye!")
             break 
         else:
-            print("Invalid input. Please enter 1, 2, or 3.\n")
+            print("Invalid input. Please enter 1, 2, 3, 4, 5, or 6.\n")
 
 if __name__ == "__main__":
     main()
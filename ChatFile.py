@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+from DES_Chat import encrypt_bytes, decrypt_bytes
+from DES_Stream import StreamEncryptor, StreamDecryptor
+from ChatProtocol import (send_parts, send_frame, recv_frame, FrameReader, BINARY_MAGIC,
+                          FRAME_HEADER, FRAME_FILE_HEADER, FRAME_FILE_CHUNK, FRAME_FILE_END,
+                          FRAME_FILE_ACK)
+
+# File transfer over a one-shot binary connection, after the usual
+# handshake:
+#
+#   sender                                receiver
+#   BINARY_MAGIC, FILE_HEADER(name, size)  ->
+#                                         <-  FILE_ACK "ready" (or "refused")
+#   FILE_CHUNK ... FILE_CHUNK              ->
+#   FILE_END(SHA-256 of the file)          ->
+#                                         <-  FILE_ACK "ok" (or "mismatch")
+#
+# Chunks are one CTR stream (the first starts with its nonce). Each side
+# runs two stages joined by a short queue: the sender encrypts the next
+# chunk while the current one is sent, and the receiver reads the next
+# chunk while the current one is decrypted and written. The queues bound
+# memory to a few chunks whatever the file size.
+
+FILE_CHUNK_SIZE = 256 * 1024
+MAX_FILE_CHUNK = 4 * 1024 * 1024
+FILE_QUEUE_DEPTH = 4
+# A receiver answers the header at once; receivers that only take messages
+# never answer, and wait for EOF instead.
+FILE_READY_TIMEOUT = 5.0
+FILE_ACK_TIMEOUT = 30.0
+PROGRESS_INTERVAL = 1.0
+ACK_READY = b"ready"
+ACK_REFUSED = b"refused"
+ACK_OK = b"ok"
+ACK_MISMATCH = b"mismatch"
+
+
+class Progress:
+    def __init__(self, total, log=print):
+        self.total = total
+        self.log = log
+        self.done = 0
+        self.start = self.last_report = time.monotonic()
+
+    def rate(self):
+        elapsed = time.monotonic() - self.start
+        return self.done / elapsed / 1e6 if elapsed > 0 else 0.0
+
+    def update(self, count):
+        self.done += count
+        now = time.monotonic()
+        if now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            percent = 100.0 * self.done / self.total if self.total else 100.0
+            self.log(f"{self.done / 1e6:.2f}/{self.total / 1e6:.2f} MB ({percent:.0f}%), "
+                     f"{self.rate():.2f} MB/s")
+
+    def summary(self):
+        return {'bytes': self.done, 'seconds': time.monotonic() - self.start,
+                'mb_per_s': self.rate()}
+
+
+def put_until(items, item, stop):
+    # queue.put that gives up once the other stage has stopped.
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def expect_ack(sock, timeout=FILE_ACK_TIMEOUT):
+    previous = sock.gettimeout()
+    sock.settimeout(timeout)
+    try:
+        frame = recv_frame(sock)
+    except socket.timeout:
+        frame = None
+    finally:
+        sock.settimeout(previous)
+    if frame is None or frame[0] != FRAME_FILE_ACK:
+        raise ConnectionError("Receiver does not accept files (or left).")
+    return frame[1]
+
+
+def encrypt_chunks(path, key, chunk_size, items, stop, digest):
+    # Producer stage: file -> ciphertext chunks on `items`, then None. An
+    # exception is passed along for the sending side to raise.
+    try:
+        stream = StreamEncryptor(key, 'CTR')
+        with open(path, 'rb') as source:
+            while not stop.is_set():
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                if not put_until(items, (len(chunk), stream.update(chunk)), stop):
+                    return
+        tail = stream.finalize()
+        if tail:
+            put_until(items, (0, tail), stop)
+        put_until(items, None, stop)
+    except Exception as e:
+        put_until(items, e, stop)
+
+def send_file(sock, path, key, chunk_size=FILE_CHUNK_SIZE, log=print):
+    # Returns a summary dict; raises on refusal, I/O errors or a failed
+    # integrity check on the receiver.
+    # The first chunk also carries the 8-byte nonce.
+    chunk_size = max(1, min(chunk_size, MAX_FILE_CHUNK - 8))
+    size = os.path.getsize(path)
+    header = json.dumps({'name': os.path.basename(path), 'size': size}).encode('utf-8')
+    encrypted = encrypt_bytes(header, key)
+    send_parts(sock, [BINARY_MAGIC, FRAME_HEADER.pack(FRAME_FILE_HEADER, len(encrypted)), encrypted])
+    reply = expect_ack(sock, FILE_READY_TIMEOUT)
+    if reply != ACK_READY:
+        raise ConnectionError(f"Receiver refused the file: {reply.decode('utf-8', errors='replace')}")
+
+    items = queue.Queue(FILE_QUEUE_DEPTH)
+    stop = threading.Event()
+    digest = hashlib.sha256()
+    producer = threading.Thread(target=encrypt_chunks,
+                                args=(path, key, chunk_size, items, stop, digest), daemon=True)
+    progress = Progress(size, log)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            count, data = item
+            send_frame(sock, FRAME_FILE_CHUNK, data)
+            progress.update(count)
+    finally:
+        stop.set()
+        producer.join()
+
+    send_frame(sock, FRAME_FILE_END, encrypt_bytes(digest.digest(), key))
+    reply = expect_ack(sock)
+    if reply != ACK_OK:
+        raise ValueError("Receiver's integrity check failed.")
+    summary = progress.summary()
+    summary['sha256'] = digest.hexdigest()
+    return summary
+
+
+def download_path(name, directory):
+    # Only the base name is used, and existing files are never overwritten.
+    name = os.path.basename(name.replace("\\", "/"))
+    if name in ("", ".", ".."):
+        raise ValueError("Sender gave no usable file name.")
+    stem, extension = os.path.splitext(name)
+    path = os.path.join(directory, name)
+    copy = 1
+    while os.path.exists(path) or os.path.exists(path + ".part"):
+        path = os.path.join(directory, f"{stem} ({copy}){extension}")
+        copy += 1
+    return path
+
+def decrypt_chunks(key, target, items, digest, progress, failure):
+    # Consumer stage: ciphertext chunks -> file. After an error it keeps
+    # draining, so the reading side never blocks on a full queue.
+    stream = StreamDecryptor(key, 'CTR')
+    while True:
+        chunk = items.get()
+        if chunk is None:
+            break
+        if failure:
+            continue
+        try:
+            data = stream.update(chunk)
+            digest.update(data)
+            target.write(data)
+            progress.update(len(data))
+        except Exception as e:
+            failure.append(e)
+    if not failure:
+        try:
+            stream.finalize()
+        except Exception as e:
+            failure.append(e)
+
+def receive_file(conn, header, key, directory=".", log=print):
+    # `header` is the FILE_HEADER payload recv_message() returned. Returns a
+    # summary dict; raises if the transfer fails (the partial file is
+    # removed).
+    try:
+        info = json.loads(decrypt_bytes(header, key).decode('utf-8'))
+        size = int(info['size'])
+        path = download_path(str(info['name']), directory)
+    except (ValueError, KeyError, TypeError) as e:
+        send_frame(conn, FRAME_FILE_ACK, ACK_REFUSED)
+        raise ValueError(f"Bad file header: {e}")
+    log(f"Receiving {info['name']!r} ({size:,} bytes) into {path}...")
+
+    part_path = path + ".part"
+    items = queue.Queue(FILE_QUEUE_DEPTH)
+    digest = hashlib.sha256()
+    failure = []
+    progress = Progress(size, log)
+    reader = FrameReader(conn, buffer_size=0, max_size=MAX_FILE_CHUNK)
+    try:
+        with open(part_path, 'wb') as target:
+            consumer = threading.Thread(target=decrypt_chunks,
+                                        args=(key, target, items, digest, progress, failure),
+                                        daemon=True)
+            consumer.start()
+            send_frame(conn, FRAME_FILE_ACK, ACK_READY)
+            try:
+                while True:
+                    frame = reader.read_frame()
+                    if frame is None:
+                        raise ConnectionError("Sender left before the end of the file.")
+                    kind, payload = frame
+                    if kind == FRAME_FILE_END:
+                        expected = decrypt_bytes(payload, key)
+                        break
+                    if kind != FRAME_FILE_CHUNK:
+                        raise ValueError(f"Unexpected frame kind {kind} during file transfer.")
+                    # The reader's buffer is reused for the next frame.
+                    chunk = bytes(payload)
+                    items.put(chunk)
+            finally:
+                items.put(None)
+                consumer.join()
+        if failure:
+            raise failure[0]
+        if digest.digest() != expected or progress.done != size:
+            send_frame(conn, FRAME_FILE_ACK, ACK_MISMATCH)
+            raise ValueError("Integrity check failed: the file does not match the sender's.")
+        os.replace(part_path, path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    send_frame(conn, FRAME_FILE_ACK, ACK_OK)
+    summary = progress.summary()
+    summary.update(path=path, sha256=digest.hexdigest())
+    return summary
@@ -0,0 +1,248 @@
+import argparse
+import multiprocessing
+import socket
+import sys
+import threading
+import time
+
+from ChatProtocol import (announce_capabilities, negotiate_format, encrypt_message,
+                          recv_message, decrypt_payload, WIRE_FORMATS)
+from DES_Bench import percentile
+
+LOAD_HOST = "127.0.0.1"
+BASE_PORT = 56100
+LOAD_KEY = "loadtest"
+ACCEPT_TIMEOUT = 0.5
+DRAIN_TIMEOUT = 5.0
+
+# Every message carries "<sequence>:<send time>:" ahead of its filler, so
+# receivers can measure end-to-end latency. time.monotonic() is system-wide
+# on Linux, so this also works when senders run in other processes.
+
+
+def quiet(*args, **kwargs):
+    pass
+
+def make_message(sequence, size):
+    header = f"{sequence}:{time.monotonic():.9f}:"
+    return header + "x" * max(0, size - len(header))
+
+def message_sent_at(text):
+    return float(text.split(":", 2)[1])
+
+
+class LoadReceiver:
+    def __init__(self, port, mode='plain', wire='binary', key=LOAD_KEY):
+        self.port = port
+        self.mode = mode
+        self.formats = WIRE_FORMATS if wire == 'binary' else (b"hex",)
+        self.key = key
+        self.latencies = []
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((LOAD_HOST, port))
+        self.server.listen(128)
+        self.server.settimeout(ACCEPT_TIMEOUT)
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.server.close()
+
+    def received(self):
+        with self.lock:
+            return len(self.latencies) + self.errors
+
+    def serve(self):
+        # One connection per message, handled in turn, like receiver_mode().
+        while not self.stopped.is_set():
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            with conn:
+                try:
+                    latency = self.handle(conn)
+                except Exception:
+                    latency = None
+            with self.lock:
+                if latency is None:
+                    self.errors += 1
+                else:
+                    self.latencies.append(latency)
+
+    def handle(self, conn):
+        conn.settimeout(None)
+        if self.mode == 'rsa':
+            import ChatByRSA
+            private_key, public_pem = ChatByRSA.key_manager.acquire()
+            key = ChatByRSA.receiver_handshake(conn, private_key, public_pem, self.formats, quiet)
+            if key is None:
+                return None
+        else:
+            key = self.key
+            announce_capabilities(conn, formats=self.formats)
+        wire_format, data = recv_message(conn)
+        if not data:
+            return None
+        _, text = decrypt_payload(wire_format, data, key)
+        return time.monotonic() - message_sent_at(text)
+
+
+def run_sender(port, messages, size, rate, mode='plain', key=LOAD_KEY, resume=True,
+               compression=None, results=None):
+    # Sends `messages` one-shot messages to `port` at up to `rate` per
+    # second (0 = as fast as possible); returns (sent, errors, handshakes).
+    if mode == 'rsa':
+        import ChatByRSA
+    sent = errors = 0
+    handshakes = []
+    start = time.monotonic()
+    for sequence in range(messages):
+        if rate > 0:
+            delay = start + sequence / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        try:
+            with socket.create_connection((LOAD_HOST, port), timeout=10) as s:
+                handshake_start = time.monotonic()
+                if mode == 'rsa':
+                    peer = (LOAD_HOST, port) if resume else None
+                    result = ChatByRSA.sender_handshake(s, peer, quiet, compression)
+                    if result is None:
+                        raise ConnectionError("Receiver left during the handshake.")
+                    message_key, wire_format = result
+                else:
+                    message_key, wire_format = key, negotiate_format(s, compression=compression)
+                handshakes.append(time.monotonic() - handshake_start)
+                s.sendall(encrypt_message(make_message(sequence, size), message_key, wire_format))
+                s.shutdown(socket.SHUT_WR)
+                s.recv(1)  # wait for the receiver to finish and close
+            sent += 1
+        except OSError:
+            errors += 1
+    if results is not None:
+        results.put((sent, errors, handshakes))
+    return sent, errors, handshakes
+
+
+def run_load(peers=1, messages=100, size=64, rate=0.0, mode='plain', wire='binary',
+             base_port=BASE_PORT, processes=False, resume=True, compression=None):
+    receivers = [LoadReceiver(base_port + i, mode, wire).start() for i in range(peers)]
+    if mode == 'rsa':
+        import ChatByRSA
+        ChatByRSA.key_manager.start()
+
+    start = time.monotonic()
+    sender_args = [(base_port + i, messages, size, rate, mode, LOAD_KEY, resume, compression)
+                   for i in range(peers)]
+    if processes:
+        queue = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=run_sender, args=args + (queue,))
+                   for args in sender_args]
+        for worker in workers:
+            worker.start()
+        sender_results = [queue.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+    else:
+        sender_results = [None] * peers
+
+        def sender_thread(index):
+            sender_results[index] = run_sender(*sender_args[index])
+
+        threads = [threading.Thread(target=sender_thread, args=(i,)) for i in range(peers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    sent = sum(result[0] for result in sender_results)
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    while (sum(receiver.received() for receiver in receivers) < sent
+           and time.monotonic() < deadline):
+        time.sleep(0.01)
+    elapsed = time.monotonic() - start
+    for receiver in receivers:
+        receiver.stop()
+
+    latencies = sorted(latency for receiver in receivers for latency in receiver.latencies)
+    handshakes = sorted(value for result in sender_results for value in result[2])
+    return {
+        'sent': sent,
+        'delivered': len(latencies),
+        'send_errors': sum(result[1] for result in sender_results),
+        'receive_errors': sum(receiver.errors for receiver in receivers),
+        'seconds': elapsed,
+        'messages_per_s': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'mb_per_s': len(latencies) * size / elapsed / 1e6 if elapsed > 0 else 0.0,
+        'latency_ms': summarize(latencies),
+        'handshake_ms': summarize(handshakes),
+    }
+
+def summarize(values):
+    if not values:
+        return {}
+    return {
+        'p50': percentile(values, 0.50) * 1e3,
+        'p90': percentile(values, 0.90) * 1e3,
+        'p99': percentile(values, 0.99) * 1e3,
+        'max': values[-1] * 1e3,
+    }
+
+def format_summary(name, summary):
+    if not summary:
+        return f"{name}: no samples"
+    return (f"{name}: p50 {summary['p50']:.2f} ms, p90 {summary['p90']:.2f} ms, "
+            f"p99 {summary['p99']:.2f} ms, max {summary['max']:.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Push load through the chat on 127.0.0.1.")
+    parser.add_argument("--mode", default="plain", choices=["plain", "rsa"],
+                        help="plain = Chat.py shared key, rsa = ChatByRSA.py key exchange")
+    parser.add_argument("--wire", default="binary", choices=["binary", "hex"],
+                        help="wire format the receivers offer")
+    parser.add_argument("--peers", type=int, default=1, help="sender/receiver pairs")
+    parser.add_argument("--messages", type=int, default=100, help="messages per sender")
+    parser.add_argument("--size", type=int, default=64, help="message size in bytes")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="messages per second per sender (0 = unthrottled)")
+    parser.add_argument("--port", type=int, default=BASE_PORT, help="first receiver port")
+    parser.add_argument("--processes", action="store_true",
+                        help="run each sender in its own process")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="rsa mode: do a full key exchange for every message")
+    parser.add_argument("--compression", default="none", choices=["none", "zlib", "lzma"],
+                        help="compress messages before encryption (the filler compresses well)")
+    args = parser.parse_args(argv)
+
+    try:
+        report = run_load(args.peers, args.messages, args.size, args.rate, args.mode,
+                          args.wire, args.port, args.processes, not args.no_resume,
+                          None if args.compression == "none" else args.compression)
+    except OSError as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"{args.mode}/{args.wire}: {report['delivered']}/{report['sent']} messages delivered "
+          f"in {report['seconds']:.2f}s ({report['messages_per_s']:.1f} msg/s, "
+          f"{report['mb_per_s']:.3f} MB/s)")
+    print(format_summary("end-to-end latency", report['latency_ms']))
+    print(format_summary("handshake", report['handshake_ms']))
+    if report['send_errors'] or report['receive_errors']:
+        print(f"Errors: {report['send_errors']} on send, {report['receive_errors']} on receive")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
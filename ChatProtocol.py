@@ -0,0 +1,354 @@
+import socket
+import struct
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+from DES_Chat import (des_encrypt, des_decrypt, bits_to_hex, hex_to_bits, decrypt_bytes,
+                      encrypt_into, padded_length)
+
+# The receiver greets first with the wire formats it understands. Older
+# receivers never greet, so a sender that hears nothing falls back to hex.
+GREETING_PREFIX = b"DESCHAT/1"
+WIRE_FORMATS = (b"binary", b"hex")
+BINARY_MAGIC = b"\x00DESB"
+NEGOTIATION_TIMEOUT = 1.0
+MAX_GREETING = 256
+RECV_SIZE = 4096
+
+# Frames: 1-byte kind, 4-byte payload length. Binary one-shot messages are
+# BINARY_MAGIC followed by a single FRAME_MESSAGE frame.
+FRAME_HEADER = struct.Struct('!BI')
+FRAME_MESSAGE = 1
+FRAME_PING = 2
+FRAME_PONG = 3
+FRAME_BYE = 4
+FRAME_HANDSHAKE = 5
+# 6 and 7 are compressed messages (COMPRESSION_FRAMES). A one-shot
+# connection whose first frame is FRAME_FILE_HEADER carries a file (see
+# ChatFile.py), and recv_message() reports it as wire format 'file'.
+FRAME_FILE_HEADER = 8
+FRAME_FILE_CHUNK = 9
+FRAME_FILE_END = 10
+FRAME_FILE_ACK = 11
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+FRAME_BUFFER_SIZE = 64 * 1024
+PEM_END_MARKER = b"-----END PUBLIC KEY-----"
+SESSION_GREETING = GREETING_PREFIX + b" session"
+
+# Optional compression before encryption. Receivers list the codecs they
+# can undo after the wire formats; a sender that shares one tags each
+# compressed message (its own frame kind, or a "codec:" prefix on hex), so
+# plain messages and older peers are unaffected. The agreed codec travels
+# in the wire format string, e.g. 'binary+zlib'.
+COMPRESSION_FRAMES = {'zlib': 6, 'lzma': 7}
+if lzma is None:
+    del COMPRESSION_FRAMES['lzma']
+COMPRESSIONS = tuple(codec.encode('ascii') for codec in COMPRESSION_FRAMES)
+# Smaller messages are sent as they are: the codec header alone eats most of
+# what could be saved. Compressed output must also save at least a block.
+MIN_COMPRESS_SIZE = 128
+MIN_COMPRESS_SAVING = 8
+ZLIB_LEVEL = 6
+LZMA_PRESET = 6
+
+CAPABILITY_GREETING = (GREETING_PREFIX + b" " + b" ".join(WIRE_FORMATS + COMPRESSIONS)
+                       + b"\n")
+
+
+def announce_capabilities(conn, extra=(), formats=WIRE_FORMATS, compressions=COMPRESSIONS):
+    # `extra` words (e.g. session resumption status) ride on the same line.
+    if not extra and formats == WIRE_FORMATS and compressions == COMPRESSIONS:
+        conn.sendall(CAPABILITY_GREETING)
+        return
+    words = (GREETING_PREFIX,) + tuple(formats) + tuple(compressions) + tuple(extra)
+    conn.sendall(b" ".join(words) + b"\n")
+
+def read_line(sock, limit=MAX_GREETING):
+    line = bytearray()
+    while len(line) < limit:
+        byte = sock.recv(1)
+        if not byte or byte == b"\n":
+            break
+        line += byte
+    return bytes(line)
+
+def read_greeting(sock, timeout=NEGOTIATION_TIMEOUT):
+    # Returns the greeting's words, or [] when the peer never greets.
+    previous = sock.gettimeout()
+    sock.settimeout(timeout)
+    try:
+        words = read_line(sock).split()
+    except socket.timeout:
+        return []
+    finally:
+        sock.settimeout(previous)
+    if words[:1] != [GREETING_PREFIX]:
+        return []
+    return words[1:]
+
+def format_from_greeting(words, compression=None):
+    # `compression` is the sender's preferred codec; it is only used when the
+    # receiver listed it.
+    wire_format = 'binary' if b"binary" in words else 'hex'
+    if compression and compression.encode('ascii') in words and compression in COMPRESSION_FRAMES:
+        wire_format += '+' + compression
+    return wire_format
+
+def negotiate_format(sock, timeout=NEGOTIATION_TIMEOUT, compression=None):
+    return format_from_greeting(read_greeting(sock, timeout), compression)
+
+
+def compress_payload(data, codec):
+    # Returns the compressed bytes, or None when compressing doesn't pay.
+    if not codec or len(data) < MIN_COMPRESS_SIZE:
+        return None
+    if codec == 'zlib':
+        compressed = zlib.compress(data, ZLIB_LEVEL)
+    else:
+        compressed = lzma.compress(data, preset=LZMA_PRESET)
+    if len(compressed) > len(data) - MIN_COMPRESS_SAVING:
+        return None
+    return compressed
+
+def decompress_payload(data, codec, limit=MAX_FRAME_SIZE):
+    # Bounded, so a small message can't expand into an unbounded allocation.
+    if codec == 'zlib':
+        decompressor = zlib.decompressobj()
+        result = decompressor.decompress(data, limit)
+        finished = decompressor.eof and not decompressor.unconsumed_tail
+    elif codec == 'lzma' and lzma is not None:
+        decompressor = lzma.LZMADecompressor()
+        result = decompressor.decompress(data, limit)
+        finished = decompressor.eof
+    else:
+        raise ValueError(f"Unsupported compression {codec!r}.")
+    if not finished:
+        raise ValueError(f"Compressed message is truncated or larger than {limit} bytes.")
+    return result
+
+def encrypt_message(plaintext, key, wire_format):
+    wire_format, _, codec = wire_format.partition('+')
+    data = plaintext.encode('utf-8')
+    compressed = compress_payload(data, codec)
+    if wire_format == 'binary':
+        kind = FRAME_MESSAGE
+        if compressed is not None:
+            data, kind = compressed, COMPRESSION_FRAMES[codec]
+        size = padded_length(len(data))
+        start = len(BINARY_MAGIC) + FRAME_HEADER.size
+        message = bytearray(start + size)
+        message[:len(BINARY_MAGIC)] = BINARY_MAGIC
+        FRAME_HEADER.pack_into(message, len(BINARY_MAGIC), kind, size)
+        encrypt_into(data, key, memoryview(message)[start:])
+        return message
+    if compressed is not None:
+        # des_encrypt takes text; latin-1 maps the bytes one to one.
+        encrypted_hex = bits_to_hex(des_encrypt(compressed.decode('latin-1'), key))
+        return f"{codec}:{encrypted_hex}".encode('utf-8')
+    return bits_to_hex(des_encrypt(plaintext, key)).encode('utf-8')
+
+def recv_all(conn, limit=MAX_FRAME_SIZE, start=b""):
+    # `start` is data already read, counted against `limit`.
+    chunks = [start]
+    total = len(start)
+    while True:
+        try:
+            data = conn.recv(RECV_SIZE)
+        except ConnectionResetError:
+            break
+        if not data:
+            break
+        total += len(data)
+        if total > limit:
+            raise ValueError(f"Message exceeds the {limit} byte limit.")
+        chunks.append(data)
+    return b"".join(chunks)
+
+def binary_format(kind):
+    if kind == FRAME_MESSAGE:
+        return 'binary'
+    if kind == FRAME_FILE_HEADER:
+        return 'file'
+    for codec, codec_kind in COMPRESSION_FRAMES.items():
+        if kind == codec_kind:
+            return 'binary+' + codec
+    raise ValueError(f"Unexpected frame kind {kind}.")
+
+def split_hex(data):
+    for codec in COMPRESSION_FRAMES:
+        prefix = codec.encode('ascii') + b":"
+        if bytes(data[:len(prefix)]) == prefix:
+            return 'hex+' + codec, data[len(prefix):]
+    return 'hex', data
+
+def split_message(data):
+    # Returns (wire_format, payload) for a complete one-shot message.
+    if bytes(data[:len(BINARY_MAGIC)]) == BINARY_MAGIC:
+        start = len(BINARY_MAGIC) + FRAME_HEADER.size
+        if len(data) < start:
+            raise ValueError("Binary message is truncated.")
+        kind, length = FRAME_HEADER.unpack_from(data, len(BINARY_MAGIC))
+        payload = memoryview(data)[start:start + length]
+        if len(payload) != length:
+            raise ValueError("Binary message is truncated.")
+        return binary_format(kind), payload
+    return split_hex(data)
+
+def recv_message(conn, reader=None):
+    # Binary senders frame their message; older hex senders send text and
+    # close, so that path still reads to EOF.
+    prefix = recv_upto(conn, len(BINARY_MAGIC))
+    if prefix == BINARY_MAGIC:
+        frame = (reader or FrameReader(conn)).read_frame()
+        if frame is None:
+            raise ValueError("Binary message is truncated.")
+        return binary_format(frame[0]), frame[1]
+    # A short hex message may end inside the prefix; keep what was read.
+    return split_hex(recv_all(conn, start=prefix))
+
+def decrypt_payload(wire_format, payload, key):
+    # Returns (ciphertext_hex, plaintext).
+    if wire_format == 'file':
+        raise ValueError("Peer sent a file; this receiver only takes messages.")
+    wire_format, _, codec = wire_format.partition('+')
+    if wire_format == 'binary':
+        data = decrypt_bytes(payload, key)
+        if codec:
+            data = decompress_payload(data, codec)
+        return payload.hex(), data.decode('utf-8', errors='replace')
+
+    encrypted_hex = bytes(payload).decode('utf-8').strip()
+    plaintext = des_decrypt(hex_to_bits(encrypted_hex), key)
+    if codec:
+        plaintext = decompress_payload(plaintext.encode('latin-1'), codec).decode('utf-8', errors='replace')
+    return encrypted_hex, plaintext
+
+def decrypt_message(data, key):
+    # Returns (wire_format, ciphertext_hex, plaintext).
+    wire_format, payload = split_message(data)
+    return (wire_format,) + decrypt_payload(wire_format, payload, key)
+
+def describe_payload(message):
+    wire_format, payload = split_message(message)
+    if wire_format.startswith('binary'):
+        return payload.hex()
+    return bytes(payload).decode('utf-8')
+
+
+def send_parts(sock, parts):
+    # Scatter-gather send, so a frame header never gets glued onto its
+    # payload with a copy.
+    views = [memoryview(part).cast('B') for part in parts]
+    if not hasattr(sock, 'sendmsg'):
+        sock.sendall(b"".join(views))
+        return
+    while views:
+        sent = sock.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if views and sent:
+            views[0] = views[0][sent:]
+
+def send_frame(sock, kind, payload=b""):
+    send_parts(sock, [FRAME_HEADER.pack(kind, len(payload)), payload])
+
+def recv_exact_into(sock, view):
+    filled = 0
+    while filled < len(view):
+        received = sock.recv_into(view[filled:])
+        if received == 0:
+            return False
+        filled += received
+    return True
+
+def recv_exact(sock, size):
+    buffer = bytearray(size)
+    if not recv_exact_into(sock, memoryview(buffer)):
+        return None
+    return buffer
+
+def recv_upto(sock, size):
+    # Like recv_exact, but returns whatever arrived before EOF.
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    filled = 0
+    try:
+        while filled < size:
+            received = sock.recv_into(view[filled:])
+            if received == 0:
+                break
+            filled += received
+    except ConnectionResetError:
+        pass
+    view.release()
+    del buffer[filled:]
+    return bytes(buffer)
+
+def recv_until(sock, marker, limit=MAX_GREETING * 64):
+    data = bytearray()
+    while marker not in data:
+        if len(data) >= limit:
+            raise ValueError("Peer sent too much data before the expected marker.")
+        chunk = sock.recv(RECV_SIZE)
+        if not chunk:
+            break
+        data += chunk
+    return bytes(data)
+
+
+class FrameReader:
+    # Reads frames with recv_into into buffers that are kept between frames
+    # (and across reconnects when `sock` is swapped). A returned payload is a
+    # memoryview that stays valid only until the next read_frame() call.
+
+    def __init__(self, sock, buffer_size=FRAME_BUFFER_SIZE, max_size=MAX_FRAME_SIZE):
+        self.sock = sock
+        self.max_size = max_size
+        self.header = bytearray(FRAME_HEADER.size)
+        self.header_view = memoryview(self.header)
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+
+    def ensure_capacity(self, size):
+        if size <= len(self.buffer):
+            return
+        self.buffer = bytearray(min(max(size, 2 * len(self.buffer)), self.max_size))
+        self.view = memoryview(self.buffer)
+
+    def read_frame(self):
+        # Returns (kind, payload), or None once the peer has closed.
+        if not recv_exact_into(self.sock, self.header_view):
+            return None
+        kind, length = FRAME_HEADER.unpack(self.header)
+        if length > self.max_size:
+            raise ValueError(f"Frame of {length} bytes exceeds the {self.max_size} byte limit.")
+        self.ensure_capacity(length)
+        payload = self.view[:length]
+        if not recv_exact_into(self.sock, payload):
+            return None
+        return kind, payload
+
+def recv_frame(sock):
+    # One-off read (e.g. during a handshake); the payload is copied out.
+    frame = FrameReader(sock, buffer_size=0).read_frame()
+    if frame is None:
+        return None
+    return frame[0], bytes(frame[1])
+
+def announce_session(conn):
+    conn.sendall(SESSION_GREETING + b"\n")
+
+def expect_session(sock, timeout=NEGOTIATION_TIMEOUT * 5):
+    previous = sock.gettimeout()
+    sock.settimeout(timeout)
+    try:
+        greeting = read_line(sock)
+    finally:
+        sock.settimeout(previous)
+    if greeting != SESSION_GREETING:
+        raise ConnectionError("Peer is not in session mode.")
@@ -0,0 +1,159 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+
+from Chat import get_key, LHOST, PORT
+from ChatProtocol import CAPABILITY_GREETING, decrypt_message
+
+MAX_CONNECTIONS = int(os.getenv("MAX_CONNECTIONS", 64))
+# Connections past MAX_CONNECTIONS that may wait for a slot; any more are
+# closed at once, and a waiting one is dropped after READ_TIMEOUT.
+MAX_WAITING_CONNECTIONS = int(os.getenv("MAX_WAITING_CONNECTIONS", 64))
+MAX_PENDING_DECRYPTS = int(os.getenv("MAX_PENDING_DECRYPTS", 8))
+DECRYPT_WORKERS = int(os.getenv("DECRYPT_WORKERS", os.cpu_count() or 1))
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+READ_SIZE = 64 * 1024
+READ_TIMEOUT = 60.0
+
+
+def ignore_interrupts():
+    # Ctrl-C is for the server process; it shuts the workers down itself.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class ChatServer:
+    def __init__(self, key, max_connections=MAX_CONNECTIONS,
+                 max_pending_decrypts=MAX_PENDING_DECRYPTS, workers=DECRYPT_WORKERS,
+                 max_waiting=MAX_WAITING_CONNECTIONS):
+        self.key = key
+        self.max_connections = max_connections
+        self.connections = asyncio.Semaphore(max_connections)
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        # At most this many messages are buffered past their first read or
+        # being decrypted; other connections stop reading, so a burst of
+        # senders backs up in TCP instead of in memory.
+        self.pending_decrypts = asyncio.Semaphore(max_pending_decrypts)
+        # Workers start lazily, after the server is listening; forked ones
+        # would inherit the listening socket and every client socket, and
+        # closing a connection here would then never reach the client.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                            initializer=ignore_interrupts)
+        self.active = 0
+        self.received = 0
+        self.refused = 0
+
+    async def read_message(self, reader, chunks=None):
+        chunks = chunks or []
+        total = sum(len(chunk) for chunk in chunks)
+        while True:
+            chunk = await asyncio.wait_for(reader.read(READ_SIZE), READ_TIMEOUT)
+            if not chunk:
+                return b"".join(chunks)
+            total += len(chunk)
+            if total > MAX_MESSAGE_SIZE:
+                raise ValueError(f"Message exceeds {MAX_MESSAGE_SIZE} bytes.")
+            chunks.append(chunk)
+
+    async def handle_client(self, reader, writer):
+        addr = writer.get_extra_info('peername')
+        try:
+            if self.connections.locked() and self.waiting >= self.max_waiting:
+                self.refused += 1
+                print(f"Connection limit ({self.max_connections} + {self.max_waiting} waiting) "
+                      f"reached; refusing {addr}.")
+                return
+            # Greet at once, even when the connection has to wait for a slot,
+            # so the sender doesn't time out and fall back to hex.
+            try:
+                writer.write(CAPABILITY_GREETING)
+                await writer.drain()
+            except OSError as e:
+                print(f"[{addr}] Dropped: {e}")
+                return
+            if self.connections.locked():
+                print(f"Connection limit ({self.max_connections}) reached; {addr} is waiting.")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.connections.acquire(), READ_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"[{addr}] Dropped: no connection slot after {READ_TIMEOUT:g}s.")
+                return
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            try:
+                await self.serve_client(reader, writer, addr)
+            finally:
+                self.active -= 1
+                self.connections.release()
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def serve_client(self, reader, writer, addr):
+        # Only the first chunk is read before taking a decrypt slot, so an
+        # idle sender doesn't hold one and a busy server buffers at most
+        # READ_SIZE per waiting connection.
+        try:
+            first = await asyncio.wait_for(reader.read(READ_SIZE), READ_TIMEOUT)
+        except (asyncio.TimeoutError, OSError) as e:
+            print(f"[{addr}] Dropped: {e}")
+            return
+        if not first:
+            print(f"[{addr}] Client disconnected before sending data.")
+            return
+
+        loop = asyncio.get_running_loop()
+        async with self.pending_decrypts:
+            try:
+                data = await self.read_message(reader, [first])
+            except (asyncio.TimeoutError, ValueError, OSError) as e:
+                print(f"[{addr}] Dropped: {e}")
+                return
+            try:
+                wire_format, _, plaintext = await loop.run_in_executor(
+                    self.executor, decrypt_message, data, self.key)
+            except Exception as e:
+                print(f"[{addr}] Error decrypting message: {e}. Was the key correct?")
+                return
+        self.received += 1
+        print(f"[{addr}] ({wire_format}) {plaintext}")
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port,
+                                            reuse_address=True, limit=READ_SIZE)
+        print(f"Async server listening on {host}:{port} "
+              f"(max {self.max_connections} connections, {self.max_waiting} waiting)...")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def main():
+    key = get_key()
+    server = ChatServer(key)
+    try:
+        asyncio.run(server.serve(LHOST, PORT))
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    except OSError as e:
+        if e.errno == 98:
+            print(f"Error: Address {LHOST}:{PORT} is already in use.")
+        else:
+            print(f"An error occurred in the server: {e}")
+    finally:
+        server.close()
+        print(f"Received {server.received} messages, refused {server.refused} connections.")
+
+if __name__ == "__main__":
+    main()
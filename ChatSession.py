@@ -0,0 +1,172 @@
+import socket
+import threading
+import time
+
+from DES_Chat import encrypt_bytes, decrypt_bytes
+from ChatProtocol import (send_frame, FrameReader, FRAME_MESSAGE, FRAME_PING, FRAME_PONG,
+                          FRAME_BYE)
+
+KEEPALIVE_INTERVAL = 15.0
+KEEPALIVE_TIMEOUT = 45.0
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+MAX_RECONNECT_ATTEMPTS = 8
+QUIT_COMMAND = "/quit"
+
+
+class ChatSession:
+    def __init__(self, open_connection, handshake):
+        # open_connection() returns a connected socket; handshake(sock)
+        # returns the DES key to use on it.
+        self.open_connection = open_connection
+        self.handshake = handshake
+        self.sock = None
+        self.key = None
+        # Kept for the whole session so its receive buffers are reused.
+        self.reader = FrameReader(None)
+        self.lock = threading.Lock()
+        self.connected = threading.Event()
+        self.closed = threading.Event()
+        self.last_sent = time.monotonic()
+
+    def connect(self):
+        delay = BACKOFF_INITIAL
+        for attempt in range(1, MAX_RECONNECT_ATTEMPTS + 1):
+            if self.closed.is_set():
+                return False
+            sock = None
+            try:
+                sock = self.open_connection()
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                key = self.handshake(sock)
+            except Exception as e:
+                if sock is not None:
+                    sock.close()
+                if self.closed.is_set():
+                    return False
+                print(f"Connection attempt {attempt} failed: {e}. Retrying in {delay:.1f}s...")
+                self.closed.wait(delay)
+                delay = min(delay * 2, BACKOFF_MAX)
+                continue
+
+            with self.lock:
+                self.sock, self.key = sock, key
+                self.reader.sock = sock
+                self.last_sent = time.monotonic()
+            self.connected.set()
+            print("Session connected. Type messages, or /quit to leave.")
+            return True
+
+        print("Giving up after repeated connection failures.")
+        return False
+
+    def drop_connection(self):
+        self.connected.clear()
+        with self.lock:
+            sock, self.sock = self.sock, None
+        if sock is not None:
+            sock.close()
+
+    def send(self, kind, payload=b""):
+        with self.lock:
+            if self.sock is None:
+                raise ConnectionError("Not connected.")
+            send_frame(self.sock, kind, payload)
+            self.last_sent = time.monotonic()
+
+    def send_message(self, text):
+        if not self.connected.is_set():
+            print("Not connected yet; message not sent.")
+            return False
+        try:
+            self.send(FRAME_MESSAGE, encrypt_bytes(text.encode('utf-8'), self.key))
+            return True
+        except OSError as e:
+            print(f"Send failed ({e}); reconnecting. Message not sent.")
+            self.drop_connection()
+            return False
+
+    def handle_frame(self, kind, payload):
+        if kind == FRAME_MESSAGE:
+            try:
+                text = decrypt_bytes(payload, self.key).decode('utf-8', errors='replace')
+                print(f"\nPeer: {text}")
+            except ValueError as e:
+                print(f"\n--- Error decrypting message: {e} ---")
+        elif kind == FRAME_PING:
+            self.send(FRAME_PONG)
+        elif kind == FRAME_BYE:
+            print("\nPeer left the session. Press Enter to return to menu.")
+            self.closed.set()
+
+    def read_loop(self):
+        while not self.closed.is_set():
+            if not self.connected.is_set() and not self.connect():
+                self.closed.set()
+                break
+            sock = self.sock
+            try:
+                # Anything (message, ping or pong) counts as a sign of life.
+                sock.settimeout(KEEPALIVE_TIMEOUT)
+                frame = self.reader.read_frame()
+                if frame is not None:
+                    self.handle_frame(*frame)
+                    continue
+            except (OSError, ValueError, AttributeError):
+                pass
+            if self.closed.is_set():
+                break
+            print("\nConnection lost. Reconnecting...")
+            self.drop_connection()
+
+    def keepalive_loop(self):
+        while not self.closed.wait(KEEPALIVE_INTERVAL / 3):
+            if not self.connected.is_set():
+                continue
+            if time.monotonic() - self.last_sent >= KEEPALIVE_INTERVAL:
+                try:
+                    self.send(FRAME_PING)
+                except OSError:
+                    pass
+
+    def close(self):
+        self.closed.set()
+        if self.connected.is_set():
+            try:
+                self.send(FRAME_BYE)
+            except OSError:
+                pass
+        self.drop_connection()
+
+    def run(self):
+        if not self.connect():
+            return
+        reader = threading.Thread(target=self.read_loop, daemon=True)
+        keepalive = threading.Thread(target=self.keepalive_loop, daemon=True)
+        reader.start()
+        keepalive.start()
+        try:
+            while not self.closed.is_set():
+                text = input()
+                if self.closed.is_set() or text == QUIT_COMMAND:
+                    break
+                if text:
+                    self.send_message(text)
+        except (EOFError, KeyboardInterrupt):
+            pass
+        finally:
+            self.close()
+            reader.join(timeout=1)
+
+
+def listen_socket(host, port):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen()
+    return server
+
+def connect_socket(host, port, timeout=5):
+    sock = socket.create_connection((host, port), timeout=timeout)
+    sock.settimeout(None)
+    return sock
@@ -1,3 +1,10 @@
+import hashlib
+import marshal
+import os
+import re
+import threading
+from collections import OrderedDict
+
 
 IP = [58, 50, 42, 34, 26, 18, 10, 2,
       60, 52, 44, 36, 28, 20, 12, 4,
@@ -115,84 +122,375 @@ def bits_to_string(bits):
         chars.append(chr(char_code))
     return "".join(chars)
 
-def bits_to_hex(bits):
-    hex_chars = []
-    for i in range(0, len(bits), 4):
-        nibble_bits = bits[i:i+4]
-        nibble_str = ''.join(map(str, nibble_bits))
-        hex_val = hex(int(nibble_str, 2))[2:] 
-        hex_chars.append(hex_val)
-    return "".join(hex_chars)
+BIT_CHARS = bytes.maketrans(b"\x00\x01", b"01")
+BIT_VALUES = bytes.maketrans(b"01", b"\x00\x01")
+HEX_DIGITS = re.compile(r"[0-9a-fA-F]*")
 
+def bits_to_hex(bits):
+    # Whole-buffer conversion: bits -> "0101..." -> one int -> hex digits.
+    # A short final group still gives its own digit, as it always has.
+    if not bits:
+        return ""
+    whole = len(bits) - len(bits) % 4
+    digits = ""
+    if whole:
+        value = int(bytes(bits[:whole]).translate(BIT_CHARS), 2)
+        digits = format(value, f'0{whole // 4}x')
+    if whole < len(bits):
+        digits += format(int(bytes(bits[whole:]).translate(BIT_CHARS), 2), 'x')
+    return digits
+
+def hex_to_bits(hex_str):
+    hex_str = hex_str.strip()
+    if not hex_str:
+        return []
+    # int() alone would also take "0x" prefixes and "_" separators.
+    if not HEX_DIGITS.fullmatch(hex_str):
+        raise ValueError(f"Invalid hex string: {hex_str[:32]!r}")
+    bit_str = format(int(hex_str, 16), f'0{len(hex_str) * 4}b')
+    return list(bit_str.encode('ascii').translate(BIT_VALUES))
 
 
 def generate_round_keys(key_bits):
-    key_56 = permute(key_bits, PC1)
-
-    left_half = key_56[:28]
-    right_half = key_56[28:]
+    round_keys = generate_round_keys_int(bits_to_int(key_bits[:64]))
+    return [bytes_to_bits(round_key.to_bytes(6, 'big')) for round_key in round_keys]
 
-    round_keys = []
-    for i in range(16):
-        shift = KEY_SHIFTS[i]
-        left_half = left_half[shift:] + left_half[:shift]
-        right_half = right_half[shift:] + right_half[:shift]
-
-        # 48 Bits
-        combined_key = left_half + right_half
-        round_key = permute(combined_key, PC2)
-        round_keys.append(round_key)
 
-    return round_keys
 
+def mangler_function(right_half, round_key):
+    f_result = mangler_function_int(bits_to_int(right_half), bits_to_int(round_key))
+    return int_to_bits(f_result, 32)
 
 
-def mangler_function(right_half, round_key):
-    expanded_bits = permute(right_half, E)
+def des_process(block_bits, key_bits, mode='encrypt'):
 
-    xored_bits = xor(expanded_bits, round_key)
+    schedule = get_key_schedule(bits_to_int(key_bits[:64]).to_bytes(8, 'big'))
+    round_keys = schedule.round_keys(mode)
 
-    s_box_output = []
-    for i in range(8):
-        chunk = xored_bits[i*6 : (i+1)*6]
-        
-        row = int(str(chunk[0]) + str(chunk[5]), 2)
-        col = int("".join(map(str, chunk[1:5])), 2)
-        
-        val = S_BOXES[i][row][col]
-        s_box_output.extend([int(b) for b in format(val, '04b')])
-    
-    p_box_output = permute(s_box_output, P)
+    processed_block = des_process_int(bits_to_int(block_bits[:64]), round_keys)
     
-    return p_box_output
+    return int_to_bits(processed_block, 64)
+
+
+# Integer engine: blocks, halves and round keys are plain ints (bit 1 of the
+# tables is the most significant bit), so no per-bit lists are built.
+
+def bits_to_int(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bit
+    return value
+
+def int_to_bits(value, width):
+    return [(value >> shift) & 1 for shift in range(width - 1, -1, -1)]
+
+def permute_int(value, table, width):
+    result = 0
+    for i in table:
+        result = (result << 1) | ((value >> (width - i)) & 1)
+    return result
+
+def build_permutation_table(table, width):
+    # One lookup list per input byte: byte value -> its bits already moved to
+    # their output positions, so a permutation is one OR per input byte.
+    out_width = len(table)
+    byte_tables = []
+    for byte_index in range(width // 8):
+        lookup = []
+        for byte_value in range(256):
+            value = byte_value << (width - 8 * (byte_index + 1))
+            lookup.append(permute_int(value, table, width))
+        byte_tables.append(lookup)
+    return byte_tables, out_width
+
+def permute_bytes(value, permutation_table):
+    byte_tables, _ = permutation_table
+    result = 0
+    shift = len(byte_tables) * 8
+    for lookup in byte_tables:
+        shift -= 8
+        result |= lookup[(value >> shift) & 0xFF]
+    return result
+
+def build_sp_boxes():
+    # SP_BOXES[i][chunk] is S-box i applied to the raw 6-bit chunk (row and
+    # column bits included) with its 4 output bits already routed through P.
+    sp_boxes = []
+    for i in range(8):
+        lookup = []
+        for chunk in range(64):
+            row = ((chunk >> 4) & 2) | (chunk & 1)
+            col = (chunk >> 1) & 0xF
+            s_box_output = S_BOXES[i][row][col] << (28 - 4 * i)
+            lookup.append(permute_int(s_box_output, P, 32))
+        sp_boxes.append(lookup)
+    return sp_boxes
+
+# The derived tables take ~0.1 s to build, so they are cached in the user's
+# cache directory (or DES_TABLES_FILE) and rebuilt only if the file is
+# missing, corrupt, or was made from different source tables.
+TABLES_MAGIC = b"DESTBL1\n"
+TABLES_FILE = os.getenv("DES_TABLES_FILE") or os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "des", "des_tables.bin")
+
+def tables_fingerprint():
+    source = repr((IP, FP, PC1, PC2, P, S_BOXES)).encode('ascii')
+    return hashlib.sha256(source).digest()
+
+def build_tables():
+    return {
+        'IP': build_permutation_table(IP, 64),
+        'FP': build_permutation_table(FP, 64),
+        'PC1': build_permutation_table(PC1, 64),
+        'PC2': build_permutation_table(PC2, 56),
+        'SP': build_sp_boxes(),
+    }
+
+def save_tables(path, tables):
+    payload = marshal.dumps(tables)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(TABLES_MAGIC + tables_fingerprint() + hashlib.sha256(payload).digest() + payload)
+    os.replace(temp_path, path)
+
+def load_tables(path):
+    # Returns None unless the file is intact and matches these source tables.
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    header = len(TABLES_MAGIC)
+    payload = data[header + 64:]
+    if (data[:header] != TABLES_MAGIC
+            or data[header:header + 32] != tables_fingerprint()
+            or data[header + 32:header + 64] != hashlib.sha256(payload).digest()):
+        return None
+    try:
+        return marshal.loads(payload)
+    except (EOFError, ValueError, TypeError):
+        return None
+
+def get_tables(path=TABLES_FILE):
+    tables = load_tables(path)
+    if tables is None:
+        tables = build_tables()
+        try:
+            save_tables(path, tables)
+        except OSError:
+            pass  # no writable cache: just use the tables built in memory
+    return tables
+
+_tables = get_tables()
+IP_TABLE = _tables['IP']
+FP_TABLE = _tables['FP']
+PC1_TABLE = _tables['PC1']
+PC2_TABLE = _tables['PC2']
+SP_BOXES = _tables['SP']
+SP1, SP2, SP3, SP4, SP5, SP6, SP7, SP8 = SP_BOXES
+
+def expand_window(right_half):
+    # E reads bits 32,1..32,1 in overlapping 6-bit windows, so a 34-bit
+    # wrap-around copy of the half lets chunk i be read at shift 28 - 4*i.
+    return ((right_half & 1) << 33) | (right_half << 1) | (right_half >> 31)
+
+def permute_round_keys_int(key):
+    # Straight PC1 / rotate / PC2 schedule; only used to derive the key bit
+    # masks below.
+    key_56 = permute_bytes(key, PC1_TABLE)
+
+    left_half = key_56 >> 28
+    right_half = key_56 & 0xFFFFFFF
 
+    round_keys = []
+    for shift in KEY_SHIFTS:
+        left_half = ((left_half << shift) | (left_half >> (28 - shift))) & 0xFFFFFFF
+        right_half = ((right_half << shift) | (right_half >> (28 - shift))) & 0xFFFFFFF
 
+        # 48 Bits
+        round_keys.append(permute_bytes((left_half << 28) | right_half, PC2_TABLE))
 
-def des_process(block_bits, key_bits, mode='encrypt'):
+    return round_keys
 
-    round_keys = generate_round_keys(key_bits)
-    if mode == 'decrypt':
-        round_keys.reverse()
+# The schedule only selects key bits, so the round keys of a key are the XOR
+# of the round keys of its set bits. Each key bit's share of all 16 round
+# keys is packed into one 768-bit int (round 1 in the top 48 bits), and
+# per-byte tables of those masks turn a schedule into 8 lookups.
+ROUND_KEY_MASK = (1 << 48) - 1
+ROUND_KEY_SHIFTS = tuple(range(48 * 15, -1, -48))
+
+def pack_round_keys(round_keys):
+    packed = 0
+    for round_key in round_keys:
+        packed = (packed << 48) | round_key
+    return packed
+
+def unpack_round_keys(packed):
+    return [(packed >> shift) & ROUND_KEY_MASK for shift in ROUND_KEY_SHIFTS]
+
+def build_key_bit_masks():
+    # KEY_BIT_MASKS[i] is the packed schedule of the key with only bit i+1
+    # set; the 8 parity bits get 0.
+    return [pack_round_keys(permute_round_keys_int(1 << (63 - i))) for i in range(64)]
+
+def build_key_byte_masks(bit_masks):
+    tables = []
+    for byte_index in range(8):
+        table = [0] * 256
+        for value in range(1, 256):
+            low = value & -value
+            table[value] = table[value ^ low] | bit_masks[8 * byte_index + 8 - low.bit_length()]
+        tables.append(table)
+    return tables
+
+KEY_BIT_MASKS = build_key_bit_masks()
+KEY_BYTE_MASKS = build_key_byte_masks(KEY_BIT_MASKS)
+
+def packed_round_keys(key):
+    k0, k1, k2, k3, k4, k5, k6, k7 = KEY_BYTE_MASKS
+    return (k0[key >> 56] | k1[(key >> 48) & 0xFF] | k2[(key >> 40) & 0xFF]
+            | k3[(key >> 32) & 0xFF] | k4[(key >> 24) & 0xFF] | k5[(key >> 16) & 0xFF]
+            | k6[(key >> 8) & 0xFF] | k7[key & 0xFF])
+
+def flip_key_bits(packed, key_delta):
+    # Packed schedule of key ^ key_delta from the packed schedule of key;
+    # cheaper than a full build when only a few bits change.
+    while key_delta:
+        low = key_delta & -key_delta
+        packed ^= KEY_BIT_MASKS[64 - low.bit_length()]
+        key_delta ^= low
+    return packed
+
+def generate_round_keys_int(key):
+    return unpack_round_keys(packed_round_keys(key))
+
+def mangler_function_int(right_half, round_key):
+    window = expand_window(right_half)
+    return (SP1[((window >> 28) ^ (round_key >> 42)) & 0x3F]
+            | SP2[((window >> 24) ^ (round_key >> 36)) & 0x3F]
+            | SP3[((window >> 20) ^ (round_key >> 30)) & 0x3F]
+            | SP4[((window >> 16) ^ (round_key >> 24)) & 0x3F]
+            | SP5[((window >> 12) ^ (round_key >> 18)) & 0x3F]
+            | SP6[((window >> 8) ^ (round_key >> 12)) & 0x3F]
+            | SP7[((window >> 4) ^ (round_key >> 6)) & 0x3F]
+            | SP8[(window ^ round_key) & 0x3F])
+
+def des_process_int(block, round_keys):
+    permuted_block = permute_bytes(block, IP_TABLE)
+
+    left_half = permuted_block >> 32
+    right_half = permuted_block & 0xFFFFFFFF
+
+    for round_key in round_keys:
+        left_half, right_half = right_half, left_half ^ mangler_function_int(right_half, round_key)
+
+    return permute_bytes((right_half << 32) | left_half, FP_TABLE)
+
+BYTE_BITS = [int_to_bits(i, 8) for i in range(256)]
+
+def text_block_to_int(block):
+    try:
+        return int.from_bytes(block.encode('latin-1'), 'big')
+    except UnicodeEncodeError:
+        # Characters above 0xFF widen string_to_bits; keep its first 64 bits
+        # exactly like the bit-list engine does.
+        return bits_to_int(string_to_bits(block)[:64])
+
+def bytes_to_bits(data):
+    bits = []
+    for byte in data:
+        bits.extend(BYTE_BITS[byte])
+    return bits
 
-    permuted_block = permute(block_bits, IP)
-    
-    left_half = permuted_block[:32]
-    right_half = permuted_block[32:]
+def key_to_bytes(key):
+    if len(key) != 8:
+        raise ValueError("Key must be 8 characters (64 bits) long.")
+    if isinstance(key, str):
+        return text_block_to_int(key).to_bytes(8, 'big')
+    return bytes(key)
+
+class KeySchedule:
+    def __init__(self, key, base=None):
+        # `base`: an existing schedule for a key that differs in a few bits,
+        # so only those bits' masks are applied.
+        self.key = key_to_bytes(key)
+        key_value = int.from_bytes(self.key, 'big')
+        if base is None:
+            self.packed = packed_round_keys(key_value)
+        else:
+            self.packed = flip_key_bits(base.packed, key_value ^ int.from_bytes(base.key, 'big'))
+        self.encrypt_keys = unpack_round_keys(self.packed)
+        self.decrypt_keys = self.encrypt_keys[::-1]
+
+    def round_keys(self, mode='encrypt'):
+        if mode == 'decrypt':
+            return self.decrypt_keys
+        return self.encrypt_keys
+
+    def encrypt_block(self, block):
+        return des_process_int(block, self.encrypt_keys)
+
+    def decrypt_block(self, block):
+        return des_process_int(block, self.decrypt_keys)
+
+    def wipe(self):
+        # For schedules you built yourself; ones from get_key_schedule() are
+        # shared with every other user of the same key.
+        for round_keys in (self.encrypt_keys, self.decrypt_keys):
+            for i in range(len(round_keys)):
+                round_keys[i] = 0
+        self.packed = 0
+        self.key = bytes(8)
+
+
+KEY_SCHEDULE_CACHE_SIZE = 64
+
+_key_schedule_cache = OrderedDict()
+_key_schedule_lock = threading.Lock()
+_key_schedule_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+def get_key_schedule(key):
+    key_bytes = key_to_bytes(key)
+    with _key_schedule_lock:
+        schedule = _key_schedule_cache.get(key_bytes)
+        if schedule is not None:
+            _key_schedule_cache.move_to_end(key_bytes)
+            _key_schedule_stats['hits'] += 1
+            return schedule
+        _key_schedule_stats['misses'] += 1
+
+    schedule = KeySchedule(key_bytes)
+
+    with _key_schedule_lock:
+        _key_schedule_cache[key_bytes] = schedule
+        _key_schedule_cache.move_to_end(key_bytes)
+        while len(_key_schedule_cache) > KEY_SCHEDULE_CACHE_SIZE:
+            # Evicted schedules may still be in use by another thread, so
+            # they are only dropped, never wiped.
+            _key_schedule_cache.popitem(last=False)
+            _key_schedule_stats['evictions'] += 1
+    return schedule
+
+def key_schedule_cache_info():
+    with _key_schedule_lock:
+        info = dict(_key_schedule_stats)
+        info['size'] = len(_key_schedule_cache)
+        info['maxsize'] = KEY_SCHEDULE_CACHE_SIZE
+    return info
+
+def clear_key_schedule_cache():
+    # Only drops the cache's references: schedules already handed out stay
+    # valid for whoever holds them (streams, sessions, cipher objects).
+    with _key_schedule_lock:
+        _key_schedule_cache.clear()
+        for name in _key_schedule_stats:
+            _key_schedule_stats[name] = 0
 
-    for i in range(16):
-        f_result = mangler_function(right_half, round_keys[i])
-        
-        new_right_half = xor(left_half, f_result)
-        
-        new_left_half = right_half
-        
-        left_half, right_half = new_left_half, new_right_half
 
-    final_block = right_half + left_half
-    
-    processed_block = permute(final_block, FP)
-    
-    return processed_block
 
 def pad(text):
     pad_len = 8 - (len(text) % 8)
@@ -208,32 +506,86 @@ def des_encrypt(plaintext, key):
         raise ValueError("Key must be 8 characters (64 bits) long.")
     
     padded_text = pad(plaintext)
-    key_bits = string_to_bits(key)
-    ciphertext_bits = []
+    round_keys = get_key_schedule(key).encrypt_keys
+    ciphertext = bytearray()
     
     for i in range(0, len(padded_text), 8):
-        block = padded_text[i:i+8]
-        block_bits = string_to_bits(block)
-        encrypted_block = des_process(block_bits, key_bits, mode='encrypt')
-        ciphertext_bits.extend(encrypted_block)
+        block = text_block_to_int(padded_text[i:i+8])
+        encrypted_block = des_process_int(block, round_keys)
+        ciphertext += encrypted_block.to_bytes(8, 'big')
         
-    return ciphertext_bits
+    return bytes_to_bits(ciphertext)
 
 def des_decrypt(ciphertext_bits, key):
     if len(key) != 8:
         raise ValueError("Key must be 8 characters (64 bits) long.")
         
-    key_bits = string_to_bits(key)
-    decrypted_text_bits = []
+    round_keys = get_key_schedule(key).decrypt_keys
+    decrypted = bytearray()
     
     for i in range(0, len(ciphertext_bits), 64):
         block_bits = ciphertext_bits[i:i+64]
-        decrypted_block = des_process(block_bits, key_bits, mode='decrypt')
-        decrypted_text_bits.extend(decrypted_block)
+        if len(block_bits) != 64:
+            raise ValueError("Ciphertext length must be a multiple of 64 bits.")
+        decrypted_block = des_process_int(bits_to_int(block_bits), round_keys)
+        decrypted += decrypted_block.to_bytes(8, 'big')
         
-    decrypted_text = bits_to_string(decrypted_text_bits)
+    decrypted_text = decrypted.decode('latin-1')
     return unpad(decrypted_text)
 
+def process_blocks_into(data, out, round_keys):
+    for i in range(0, len(data), 8):
+        block = int.from_bytes(data[i:i+8], 'big')
+        out[i:i+8] = des_process_int(block, round_keys).to_bytes(8, 'big')
+    return len(data)
+
+def pad_bytes_block(tail):
+    pad_len = 8 - len(tail)
+    return bytes(tail) + bytes([pad_len]) * pad_len
+
+def unpad_bytes(data):
+    pad_len = data[-1] if data else 0
+    if not 1 <= pad_len <= 8 or data[-pad_len:] != bytes([pad_len]) * pad_len:
+        raise ValueError("Invalid padding. Was the key correct?")
+    return data[:-pad_len]
+
+def padded_length(length):
+    return length + 8 - (length % 8)
+
+def encrypt_into(data, key, out):
+    data = memoryview(data).cast('B')
+    out = memoryview(out).cast('B')
+    total = padded_length(len(data))
+    if len(out) < total:
+        raise ValueError(f"Output buffer needs {total} bytes, got {len(out)}.")
+
+    round_keys = get_key_schedule(key).encrypt_keys
+    full = len(data) - (len(data) % 8)
+    process_blocks_into(data[:full], out, round_keys)
+    process_blocks_into(pad_bytes_block(data[full:]), out[full:total], round_keys)
+    return total
+
+def decrypt_into(data, key, out):
+    data = memoryview(data).cast('B')
+    out = memoryview(out).cast('B')
+    if len(data) == 0 or len(data) % 8 != 0:
+        raise ValueError("Ciphertext length must be a non-zero multiple of 8 bytes.")
+    if len(out) < len(data):
+        raise ValueError(f"Output buffer needs {len(data)} bytes, got {len(out)}.")
+
+    process_blocks_into(data, out, get_key_schedule(key).decrypt_keys)
+    return len(unpad_bytes(out[:len(data)]))
+
+def encrypt_bytes(data, key):
+    out = bytearray(padded_length(len(memoryview(data).cast('B'))))
+    encrypt_into(data, key, out)
+    return bytes(out)
+
+def decrypt_bytes(data, key):
+    out = bytearray(len(memoryview(data).cast('B')))
+    length = decrypt_into(data, key, out)
+    del out[length:]
+    return bytes(out)
 
 
 if __name__ == "__main__":
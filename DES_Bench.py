@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from DES_Chat import (string_to_bits, bits_to_hex, hex_to_bits, generate_round_keys, mangler_function,
+                      des_process, des_encrypt, des_decrypt, encrypt_bytes, decrypt_bytes, KeySchedule)
+from ChatProtocol import encrypt_message, decrypt_message
+from DES_Bitslice import process_blocks_bitsliced
+
+MESSAGE_SIZES = (8, 64, 1024, 16384)
+MIN_TIME = 0.2
+MIN_CALLS = 5
+REGRESSION_THRESHOLD = 0.10
+BENCH_KEY = "benchkey"
+
+
+def percentile(values, fraction):
+    # `values` must already be sorted.
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+def time_calls(func, min_time=MIN_TIME, min_calls=MIN_CALLS):
+    latencies = []
+    clock = time.perf_counter
+    deadline = clock() + min_time
+    while len(latencies) < min_calls or clock() < deadline:
+        start = clock()
+        func()
+        latencies.append(clock() - start)
+    return latencies
+
+def peak_allocation(func):
+    # Bytes allocated at the high-water mark of one call, on top of what
+    # was live before it.
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return max(0, peak - baseline)
+
+
+def sample_text(size):
+    return ("The quick brown fox jumps over the lazy dog. " * (size // 45 + 1))[:size]
+
+def build_cases(sizes):
+    # Yields (stage, size, func). Stages that work on a fixed 64-bit block
+    # or key are only measured once, at size 8.
+    key_bits = string_to_bits(BENCH_KEY)
+    round_keys = generate_round_keys(key_bits)
+    schedule = KeySchedule(BENCH_KEY)
+    block_bits = string_to_bits(sample_text(8))
+    right_half = block_bits[32:]
+
+    yield 'generate_round_keys', 8, lambda: generate_round_keys(key_bits)
+    yield 'key_schedule', 8, lambda: KeySchedule(BENCH_KEY)
+    yield 'mangler_function', 8, lambda: mangler_function(right_half, round_keys[0])
+    yield 'des_process', 8, lambda: des_process(block_bits, key_bits, 'encrypt')
+
+    for size in sizes:
+        text = sample_text(size)
+        data = text.encode('utf-8')
+        bits = string_to_bits(text)
+        hex_text = bits_to_hex(bits)
+        cipher_bits = des_encrypt(text, BENCH_KEY)
+        cipher_bytes = encrypt_bytes(data, BENCH_KEY)
+        binary_message = bytes(encrypt_message(text, BENCH_KEY, 'binary'))
+        hex_message = encrypt_message(text, BENCH_KEY, 'hex')
+        zlib_message = bytes(encrypt_message(text, BENCH_KEY, 'binary+zlib'))
+
+        yield 'string_to_bits', size, lambda text=text: string_to_bits(text)
+        yield 'bits_to_hex', size, lambda bits=bits: bits_to_hex(bits)
+        yield 'hex_to_bits', size, lambda hex_text=hex_text: hex_to_bits(hex_text)
+        yield 'des_encrypt', size, lambda text=text: des_encrypt(text, BENCH_KEY)
+        yield 'des_decrypt', size, lambda bits=cipher_bits: des_decrypt(bits, BENCH_KEY)
+        yield 'encrypt_bytes', size, lambda data=data: encrypt_bytes(data, BENCH_KEY)
+        yield 'decrypt_bytes', size, lambda data=cipher_bytes: decrypt_bytes(data, BENCH_KEY)
+        yield 'bitslice_blocks', size, lambda data=cipher_bytes[:size // 8 * 8]: (
+            process_blocks_bitsliced(data, schedule.encrypt_keys))
+        yield 'chat_binary_send', size, lambda text=text: encrypt_message(text, BENCH_KEY, 'binary')
+        yield 'chat_binary_receive', size, lambda m=binary_message: decrypt_message(m, BENCH_KEY)
+        yield 'chat_zlib_send', size, lambda text=text: encrypt_message(text, BENCH_KEY, 'binary+zlib')
+        yield 'chat_zlib_receive', size, lambda m=zlib_message: decrypt_message(m, BENCH_KEY)
+        yield 'chat_hex_send', size, lambda text=text: encrypt_message(text, BENCH_KEY, 'hex')
+        yield 'chat_hex_receive', size, lambda m=hex_message: decrypt_message(m, BENCH_KEY)
+
+def bench_case(func, size, min_time=MIN_TIME):
+    func()  # warm caches (key schedules, lookup tables) before timing
+    latencies = sorted(time_calls(func, min_time))
+    total = sum(latencies)
+    calls_per_s = len(latencies) / total if total > 0 else 0.0
+    return {
+        'calls': len(latencies),
+        'calls_per_s': calls_per_s,
+        'blocks_per_s': calls_per_s * max(1, size // 8),
+        'mb_per_s': calls_per_s * size / 1e6,
+        'p50_us': percentile(latencies, 0.50) * 1e6,
+        'p90_us': percentile(latencies, 0.90) * 1e6,
+        'p99_us': percentile(latencies, 0.99) * 1e6,
+        'max_us': latencies[-1] * 1e6,
+        'peak_alloc_bytes': peak_allocation(func),
+    }
+
+def run_benchmarks(sizes=MESSAGE_SIZES, stages=None, min_time=MIN_TIME, verbose=True):
+    results = {}
+    for stage, size, func in build_cases(sizes):
+        if stages and stage not in stages:
+            continue
+        name = f"{stage}@{size}"
+        results[name] = bench_case(func, size, min_time)
+        if verbose:
+            print(format_result(name, results[name]))
+    return results
+
+def format_result(name, result):
+    return (f"{name:<28} {result['mb_per_s']:9.3f} MB/s {result['blocks_per_s']:12.0f} blocks/s  "
+            f"p50 {result['p50_us']:10.1f}us  p99 {result['p99_us']:10.1f}us  "
+            f"alloc {result['peak_alloc_bytes']:>9} B")
+
+
+def save_results(path, results):
+    report = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    # Returns (name, metric, old, new) for every stage that got slower, or
+    # allocates more, by more than `threshold`.
+    regressions = []
+    for name, new in current.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if new['calls_per_s'] < old['calls_per_s'] * (1 - threshold):
+            regressions.append((name, 'calls_per_s', old['calls_per_s'], new['calls_per_s']))
+        if new['p50_us'] > old['p50_us'] * (1 + threshold):
+            regressions.append((name, 'p50_us', old['p50_us'], new['p50_us']))
+        if new['peak_alloc_bytes'] > old['peak_alloc_bytes'] * (1 + threshold) + 64:
+            regressions.append((name, 'peak_alloc_bytes', old['peak_alloc_bytes'],
+                                new['peak_alloc_bytes']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DES engine and chat pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(MESSAGE_SIZES),
+                        help="message sizes in bytes")
+    parser.add_argument("--stages", nargs="+", help="only run these stages")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME,
+                        help="seconds to spend timing each stage and size")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="allowed slowdown before flagging, e.g. 0.1 for 10%%")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = load_results(args.compare)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: Could not read baseline {args.compare}: {e}")
+            return 1
+
+    results = run_benchmarks(args.sizes, args.stages, args.min_time)
+
+    if args.save:
+        save_results(args.save, results)
+        print(f"Saved results to {os.path.abspath(args.save)}")
+
+    if baseline is None:
+        return 0
+    regressions = compare_results(baseline, results, args.threshold)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}.")
+        return 0
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} against {args.compare}:")
+    for name, metric, old, new in regressions:
+        print(f"  {name:<28} {metric:<16} {old:12.1f} -> {new:12.1f}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
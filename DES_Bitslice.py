@@ -0,0 +1,169 @@
+from DES import IP, FP, E, P, S_BOXES, PC1, PC2, KEY_SHIFTS, get_key_schedule
+
+# Bitsliced DES: a batch of N blocks is transposed into 64 bit-plane ints,
+# plane p holding bit p (DES numbering, MSB first) of every block, with
+# block k in bit k. Each gate then runs on all N blocks at once, and IP, FP,
+# E and P are only index renamings of the planes. Python ints are the SIMD
+# registers, so no NumPy is needed.
+
+# Blocks per batch; bigger batches amortize the per-gate interpreter cost
+# until the plane ints stop fitting in cache.
+BITSLICE_LANES = 1 << 16
+
+IP_INDEX = [i - 1 for i in IP]
+FP_INDEX = [i - 1 for i in FP]
+P_INDEX = [i - 1 for i in P]
+E_INDEX = [[E[6 * box + j] - 1 for j in range(6)] for box in range(8)]
+
+def build_round_key_index():
+    # ROUND_KEY_INDEX[r][j] is the key bit (0-63) that becomes bit j of round
+    # key r: the key schedule is pure bit selection, so with one key per
+    # lane it is another renaming.
+    key_56 = [i - 1 for i in PC1]
+    left_half, right_half = key_56[:28], key_56[28:]
+    rounds = []
+    for shift in KEY_SHIFTS:
+        left_half = left_half[shift:] + left_half[:shift]
+        right_half = right_half[shift:] + right_half[:shift]
+        combined = left_half + right_half
+        rounds.append([combined[i - 1] for i in PC2])
+    return rounds
+
+ROUND_KEY_INDEX = build_round_key_index()
+
+# byte value -> b"0"/b"1" for one bit of it, used to pull a plane out of a
+# column of bytes.
+PLANE_BITS = [bytes.maketrans(bytes(range(256)),
+                              bytes(ord('1') if (value >> (7 - bit)) & 1 else ord('0')
+                                    for value in range(256)))
+              for bit in range(8)]
+BIT_VALUES = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def sbox_output(box, chunk):
+    row = ((chunk >> 4) & 2) | (chunk & 1)
+    col = (chunk >> 1) & 0xF
+    return S_BOXES[box][row][col]
+
+def sbox_circuit_source(box):
+    # Straight-line gate code for one S-box, from its truth table: decode the
+    # 6 inputs into minterms (two 3-input decoders, then one AND per
+    # minterm), and OR together the minterms that set each output bit.
+    # Inputs x0..x5 are the chunk bits, x0 first; `ones` has every lane set.
+    lines = [f"def sbox_{box + 1}(x0, x1, x2, x3, x4, x5, ones):"]
+    for i in range(6):
+        lines.append(f"    n{i} = x{i} ^ ones")
+
+    def literal(i, bit):
+        return f"x{i}" if bit else f"n{i}"
+
+    for name, first in (('h', 0), ('l', 3)):
+        for pair in range(4):
+            lines.append(f"    {name}p{pair} = {literal(first, pair >> 1)} & {literal(first + 1, pair & 1)}")
+        for value in range(8):
+            lines.append(f"    {name}{value} = {name}p{value >> 1} & {literal(first + 2, value & 1)}")
+
+    for chunk in range(64):
+        if sbox_output(box, chunk):
+            lines.append(f"    m{chunk} = h{chunk >> 3} & l{chunk & 7}")
+
+    outputs = []
+    for bit in range(4):
+        terms = [f"m{chunk}" for chunk in range(64) if (sbox_output(box, chunk) >> (3 - bit)) & 1]
+        outputs.append(" | ".join(terms))
+    lines.append("    return (" + ",\n            ".join(outputs) + ")")
+    return "\n".join(lines) + "\n"
+
+def build_sbox_circuits():
+    circuits = []
+    for box in range(8):
+        namespace = {}
+        exec(compile(sbox_circuit_source(box), f"<sbox_{box + 1}>", "exec"), namespace)
+        circuits.append(namespace[f"sbox_{box + 1}"])
+    return circuits
+
+SBOX_CIRCUITS = build_sbox_circuits()
+
+
+def blocks_to_planes(data, lanes):
+    # data holds `lanes` 8-byte blocks; returns 64 plane ints.
+    planes = []
+    for byte_index in range(8):
+        column = data[byte_index::8]
+        for bit in range(8):
+            planes.append(int(column.translate(PLANE_BITS[bit])[::-1], 2))
+    return planes
+
+def planes_to_blocks(planes, lanes, out):
+    # Inverse of blocks_to_planes, written into the bytearray/memoryview `out`.
+    for byte_index in range(8):
+        column = 0
+        for bit in range(8):
+            bits = format(planes[8 * byte_index + bit], f'0{lanes}b').encode('ascii')
+            # One byte per lane, block 0 last, so block k lands in byte k.
+            column |= int.from_bytes(bits.translate(BIT_VALUES), 'big') << (7 - bit)
+        out[byte_index::8] = column.to_bytes(lanes, 'little')
+
+def key_masks(round_keys, ones):
+    # A key bit only decides whether an S-box input is inverted, so each
+    # round key becomes 48 masks of all-ones or zero.
+    return [[ones if (round_key >> (47 - j)) & 1 else 0 for j in range(48)]
+            for round_key in round_keys]
+
+def key_plane_masks(key_planes, mode='encrypt'):
+    # Round key masks when every lane has its own key, given as 64 planes.
+    masks = [[key_planes[i] for i in index] for index in ROUND_KEY_INDEX]
+    return masks[::-1] if mode == 'decrypt' else masks
+
+def value_planes(value, ones, width=64):
+    # The same `width`-bit value in every lane.
+    return [ones if (value >> (width - 1 - i)) & 1 else 0 for i in range(width)]
+
+def process_planes(planes, round_masks, ones):
+    # round_masks: one list of 48 planes per round, from key_masks() or
+    # key_plane_masks().
+    block = [planes[i] for i in IP_INDEX]
+    left_half, right_half = block[:32], block[32:]
+    circuits = SBOX_CIRCUITS
+
+    for index, masks in enumerate(round_masks):
+        if index and index % 16 == 0:
+            # Chained DES stages (3DES): the FP/IP pair in between cancels,
+            # leaving only the half swap.
+            left_half, right_half = right_half, left_half
+        s_out = []
+        for box in range(8):
+            e_index = E_INDEX[box]
+            k = 6 * box
+            s_out.extend(circuits[box](right_half[e_index[0]] ^ masks[k],
+                                       right_half[e_index[1]] ^ masks[k + 1],
+                                       right_half[e_index[2]] ^ masks[k + 2],
+                                       right_half[e_index[3]] ^ masks[k + 3],
+                                       right_half[e_index[4]] ^ masks[k + 4],
+                                       right_half[e_index[5]] ^ masks[k + 5],
+                                       ones))
+        left_half, right_half = right_half, [left_half[i] ^ s_out[P_INDEX[i]] for i in range(32)]
+
+    preoutput = right_half + left_half
+    return [preoutput[i] for i in FP_INDEX]
+
+def process_blocks_bitsliced(data, round_keys, lanes=BITSLICE_LANES):
+    # ECB over whole 8-byte blocks; matches des_process_int block for block.
+    data = bytes(data)
+    if len(data) % 8 != 0:
+        raise ValueError("Data length must be a multiple of 8 bytes.")
+    out = bytearray(len(data))
+    step = 8 * lanes
+    for start in range(0, len(data), step):
+        chunk = data[start:start + step]
+        count = len(chunk) // 8
+        ones = (1 << count) - 1
+        planes = process_planes(blocks_to_planes(chunk, count), key_masks(round_keys, ones), ones)
+        planes_to_blocks(planes, count, memoryview(out)[start:start + len(chunk)])
+    return bytes(out)
+
+def encrypt_blocks(data, key):
+    return process_blocks_bitsliced(data, get_key_schedule(key).encrypt_keys)
+
+def decrypt_blocks(data, key):
+    return process_blocks_bitsliced(data, get_key_schedule(key).decrypt_keys)
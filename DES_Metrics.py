@@ -0,0 +1,187 @@
+import sys
+import threading
+import time
+
+# Opt-in instrumentation. enable() swaps the engine functions below for
+# timed wrappers, in DES/DES_Chat and in every loaded module that imported
+# them by name; disable() puts the originals back. While disabled nothing
+# is wrapped, so the hot paths run exactly as before.
+#
+# Timers are inclusive: des_encrypt's time also shows up under
+# des_process_int, get_key_schedule and so on.
+
+ENGINE_MODULES = ('DES', 'DES_Chat', 'DES_Numpy', 'DES_Bitslice', 'DES_Triple')
+
+
+def count_none(args, result):
+    return 0, 0, 0
+
+def count_block(args, result):
+    return 1, 0, 0
+
+def count_data_blocks(args, result):
+    return len(args[0]) // 8, 0, 0
+
+def count_array_blocks(args, result):
+    # One uint64 per block.
+    return len(args[0]), 0, 0
+
+def count_into(args, result):
+    return 0, len(memoryview(args[0]).cast('B')), result
+
+def count_des_encrypt(args, result):
+    return 0, len(args[0]), len(result) // 8
+
+def count_des_decrypt(args, result):
+    return 0, len(args[0]) // 8, len(result)
+
+# stage -> (blocks, bytes_in, bytes_out) counter. Blocks are counted where
+# they are actually run (des_process_int, triple_process_int, or a NumPy or
+# bitsliced batch), so every path is covered exactly once; totals() derives
+# engine bytes from them. bytes_in/bytes_out are message sizes, and only
+# the four chat entry points report those.
+STAGES = {
+    'des_process': count_none,
+    'des_process_int': count_block,
+    'triple_process_int': count_block,
+    'process_blocks_into': count_none,
+    'process_block_array': count_array_blocks,
+    'process_blocks_bitsliced': count_data_blocks,
+    'mangler_function': count_none,
+    'mangler_function_int': count_none,
+    'generate_round_keys': count_none,
+    'generate_round_keys_int': count_none,
+    'packed_round_keys': count_none,
+    'flip_key_bits': count_none,
+    'get_key_schedule': count_none,
+    'des_encrypt': count_des_encrypt,
+    'des_decrypt': count_des_decrypt,
+    'encrypt_into': count_into,
+    'decrypt_into': count_into,
+    'encrypt_bytes': count_none,
+    'decrypt_bytes': count_none,
+    'pad': count_none,
+    'unpad': count_none,
+    'pad_bytes_block': count_none,
+    'unpad_bytes': count_none,
+    'string_to_bits': count_none,
+    'bits_to_string': count_none,
+    'bytes_to_bits': count_none,
+    'bits_to_hex': count_none,
+    'hex_to_bits': count_none,
+}
+# Every schedule is built by one of these (generate_round_keys and
+# generate_round_keys_int go through packed_round_keys).
+KEY_SCHEDULE_STAGES = ('packed_round_keys', 'flip_key_bits')
+
+_lock = threading.Lock()
+_stats = {}
+_originals = {}  # wrapper -> original function
+_enabled = False
+
+
+def new_record():
+    return {'calls': 0, 'seconds': 0.0, 'blocks': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+def timed(stage, func, count):
+    clock = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        start = clock()
+        result = func(*args, **kwargs)
+        elapsed = clock() - start
+        blocks, bytes_in, bytes_out = count(args, result)
+        with _lock:
+            record = _stats.setdefault(stage, new_record())
+            record['calls'] += 1
+            record['seconds'] += elapsed
+            record['blocks'] += blocks
+            record['bytes_in'] += bytes_in
+            record['bytes_out'] += bytes_out
+        return result
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.__wrapped__ = func
+    return wrapper
+
+def rebind(replacements):
+    # Replace every module-level reference to a key of `replacements`.
+    for module in list(sys.modules.values()):
+        namespace = getattr(module, '__dict__', None)
+        if namespace is None:
+            continue
+        for name, value in list(namespace.items()):
+            try:
+                replacement = replacements.get(value)
+            except TypeError:
+                continue
+            if replacement is not None:
+                namespace[name] = replacement
+
+def enable():
+    global _enabled
+    with _lock:
+        if _enabled:
+            return
+        _enabled = True
+    wrappers = {}
+    for module_name in ENGINE_MODULES:
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        for stage, count in STAGES.items():
+            func = getattr(module, stage, None)
+            if func is None or func in wrappers:
+                continue
+            wrapper = timed(stage, func, count)
+            wrappers[func] = wrapper
+            _originals[wrapper] = func
+    rebind(wrappers)
+
+def disable():
+    global _enabled
+    with _lock:
+        if not _enabled:
+            return
+        _enabled = False
+    rebind(_originals)
+    _originals.clear()
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+def stats():
+    # Per-stage copy: {stage: {calls, seconds, blocks, bytes_in, bytes_out}}.
+    with _lock:
+        return {stage: dict(record) for stage, record in _stats.items()}
+
+def totals():
+    snapshot = stats()
+    blocks = sum(record['blocks'] for record in snapshot.values())
+    return {
+        'blocks': blocks,
+        # Padding included; covers the stream, modes and NumPy paths too.
+        'engine_bytes': 8 * blocks,
+        'key_schedules': sum(snapshot.get(stage, new_record())['calls']
+                             for stage in KEY_SCHEDULE_STAGES),
+        'bytes_in': sum(record['bytes_in'] for record in snapshot.values()),
+        'bytes_out': sum(record['bytes_out'] for record in snapshot.values()),
+    }
+
+def format_report():
+    snapshot = stats()
+    lines = [f"{'stage':<24} {'calls':>10} {'seconds':>10} {'us/call':>10}"]
+    for stage, record in sorted(snapshot.items(), key=lambda item: -item[1]['seconds']):
+        per_call = record['seconds'] / record['calls'] * 1e6 if record['calls'] else 0.0
+        lines.append(f"{stage:<24} {record['calls']:>10} {record['seconds']:>10.4f} {per_call:>10.1f}")
+    total = totals()
+    lines.append(f"blocks={total['blocks']} engine_bytes={total['engine_bytes']} "
+                 f"key_schedules={total['key_schedules']} (built while enabled)")
+    lines.append(f"chat message bytes (des_encrypt/des_decrypt/encrypt_into/decrypt_into only): "
+                 f"in={total['bytes_in']} out={total['bytes_out']}")
+    return "\n".join(lines)
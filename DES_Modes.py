@@ -0,0 +1,129 @@
+import os
+
+from DES import KeySchedule, get_key_schedule, pad_bytes_block, unpad_bytes, padded_length
+from DES_Numpy import HAS_NUMPY, process_blocks
+
+if HAS_NUMPY:
+    import numpy as np
+
+BLOCK_MASK = (1 << 64) - 1
+
+
+def get_cipher(key):
+    # Anything with encrypt_block/decrypt_block/process_blocks (e.g. a
+    # KeySchedule or a 3DES schedule) is used as-is; keys go through the cache.
+    if hasattr(key, 'encrypt_block'):
+        return key
+    return get_key_schedule(key)
+
+def run_blocks(cipher, data, operation):
+    if isinstance(cipher, KeySchedule):
+        return process_blocks(data, cipher.round_keys(operation))
+    return cipher.process_blocks(data, operation)
+
+def xor_bytes(a, b):
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+def pad_bytes(data):
+    data = memoryview(data).cast('B')
+    full = len(data) - (len(data) % 8)
+    padded = bytearray(padded_length(len(data)))
+    padded[:full] = data[:full]
+    padded[full:] = pad_bytes_block(data[full:])
+    return padded
+
+def check_iv(iv):
+    iv = os.urandom(8) if iv is None else bytes(iv)
+    if len(iv) != 8:
+        raise ValueError("IV/nonce must be 8 bytes long.")
+    return iv
+
+
+def ecb_encrypt(data, key):
+    return run_blocks(get_cipher(key), pad_bytes(data), 'encrypt')
+
+def ecb_decrypt(data, key):
+    data = memoryview(data).cast('B')
+    if len(data) == 0 or len(data) % 8 != 0:
+        raise ValueError("Ciphertext length must be a non-zero multiple of 8 bytes.")
+    return unpad_bytes(run_blocks(get_cipher(key), data, 'decrypt'))
+
+
+def cbc_encrypt_blocks(blocks, key, iv):
+    cipher = get_cipher(key)
+    blocks = memoryview(blocks).cast('B')
+    out = bytearray(len(blocks))
+    previous = int.from_bytes(iv, 'big')
+    for i in range(0, len(blocks), 8):
+        previous = cipher.encrypt_block(int.from_bytes(blocks[i:i+8], 'big') ^ previous)
+        out[i:i+8] = previous.to_bytes(8, 'big')
+    return bytes(out)
+
+def cbc_decrypt_blocks(blocks, key, iv):
+    # Every block is decrypted in one batch, then XORed with the ciphertext
+    # shifted by one block (IV first) as a single wide-int XOR.
+    blocks = memoryview(blocks).cast('B')
+    if len(blocks) % 8 != 0:
+        raise ValueError("Ciphertext length must be a multiple of 8 bytes.")
+    if len(blocks) == 0:
+        return b""
+    decrypted = run_blocks(get_cipher(key), blocks, 'decrypt')
+    return xor_bytes(decrypted, bytes(iv) + blocks[:-8])
+
+def cbc_encrypt(data, key, iv=None):
+    iv = check_iv(iv)
+    return iv + cbc_encrypt_blocks(pad_bytes(data), key, iv)
+
+def cbc_decrypt(data, key):
+    data = memoryview(data).cast('B')
+    if len(data) < 16:
+        raise ValueError("CBC ciphertext must hold an IV and at least one block.")
+    return unpad_bytes(cbc_decrypt_blocks(data[8:], key, data[:8]))
+
+
+def ctr_counter_blocks(nonce, first_block, count):
+    start = (int.from_bytes(nonce, 'big') + first_block) & BLOCK_MASK
+    if HAS_NUMPY:
+        counters = np.arange(count, dtype=np.uint64) + np.uint64(start)
+        return counters.astype('>u8').tobytes()
+    out = bytearray(8 * count)
+    for i in range(count):
+        out[8*i:8*i+8] = ((start + i) & BLOCK_MASK).to_bytes(8, 'big')
+    return out
+
+def ctr_keystream(key, nonce, first_block, count):
+    return run_blocks(get_cipher(key), ctr_counter_blocks(nonce, first_block, count), 'encrypt')
+
+def ctr_crypt(data, key, nonce, offset=0):
+    # Counter block i is nonce + i (mod 2**64), so any byte offset can be
+    # reached directly without generating the keystream before it.
+    data = memoryview(data).cast('B')
+    if len(data) == 0:
+        return b""
+    first_block, skip = divmod(offset, 8)
+    count = (skip + len(data) + 7) // 8
+    keystream = ctr_keystream(key, nonce, first_block, count)
+    return xor_bytes(data, keystream[skip:skip + len(data)])
+
+def ctr_encrypt(data, key, nonce=None):
+    nonce = check_iv(nonce)
+    return nonce + ctr_crypt(data, key, nonce)
+
+def ctr_decrypt(data, key):
+    data = memoryview(data).cast('B')
+    if len(data) < 8:
+        raise ValueError("CTR ciphertext must start with an 8-byte nonce.")
+    return ctr_crypt(data[8:], key, data[:8])
+
+
+MODES = {
+    'ECB': (ecb_encrypt, ecb_decrypt),
+    'CBC': (cbc_encrypt, cbc_decrypt),
+    'CTR': (ctr_encrypt, ctr_decrypt),
+}
+
+def encrypt_mode(data, key, mode='CBC'):
+    return MODES[mode.upper()][0](data, key)
+
+def decrypt_mode(data, key, mode='CBC'):
+    return MODES[mode.upper()][1](data, key)
@@ -0,0 +1,98 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from DES import IP_TABLE, FP_TABLE, SP_BOXES, get_key_schedule, process_blocks_into
+
+HAS_NUMPY = np is not None
+
+# Blocks handled per vectorized pass; keeps the temporaries cache-sized.
+BATCH_BLOCKS = 1 << 14
+# Without NumPy, batches at least this big go to the bitsliced engine; below
+# it the per-block loop wins on setup cost.
+BITSLICE_THRESHOLD = 64 * 8
+
+if HAS_NUMPY:
+    IP_LOOKUP = np.array(IP_TABLE[0], dtype=np.uint64)
+    FP_LOOKUP = np.array(FP_TABLE[0], dtype=np.uint64)
+    SP_LOOKUP = np.array(SP_BOXES, dtype=np.uint32)
+
+
+def permute_blocks(blocks, lookup):
+    result = np.zeros_like(blocks)
+    for i in range(8):
+        byte_values = (blocks >> np.uint64(56 - 8 * i)) & np.uint64(0xFF)
+        result |= lookup[i][byte_values]
+    return result
+
+def split_round_key(round_key):
+    return [(round_key >> (42 - 6 * i)) & 0x3F for i in range(8)]
+
+def process_blocks_numpy(blocks, round_keys):
+    # blocks: 1-D uint64 array, one DES block per element. More than 16 round
+    # keys run chained DES stages (3DES): the FP/IP pair between stages
+    # cancels, leaving only the half swap.
+    permuted = permute_blocks(blocks, IP_LOOKUP)
+
+    left_half = (permuted >> np.uint64(32)).astype(np.uint32)
+    right_half = (permuted & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+    for index, round_key in enumerate(round_keys):
+        if index and index % 16 == 0:
+            left_half, right_half = right_half, left_half
+        key_chunks = split_round_key(round_key)
+        window = right_half.astype(np.uint64)
+        window = ((window & np.uint64(1)) << np.uint64(33)) | (window << np.uint64(1)) | (window >> np.uint64(31))
+
+        f_result = np.zeros_like(right_half)
+        for i in range(8):
+            chunk = ((window >> np.uint64(28 - 4 * i)) & np.uint64(0x3F)) ^ np.uint64(key_chunks[i])
+            f_result |= SP_LOOKUP[i][chunk]
+
+        left_half, right_half = right_half, left_half ^ f_result
+
+    final_block = (right_half.astype(np.uint64) << np.uint64(32)) | left_half.astype(np.uint64)
+    return permute_blocks(final_block, FP_LOOKUP)
+
+def process_block_array(blocks, round_keys):
+    output = np.empty_like(blocks)
+    for start in range(0, len(blocks), BATCH_BLOCKS):
+        end = start + BATCH_BLOCKS
+        output[start:end] = process_blocks_numpy(blocks[start:end], round_keys)
+    return output
+
+def process_blocks_python(data, round_keys):
+    output = bytearray(len(data))
+    process_blocks_into(data, output, round_keys)
+    return bytes(output)
+
+def process_blocks(data, round_keys):
+    if HAS_NUMPY and isinstance(data, np.ndarray):
+        array = np.ascontiguousarray(data, dtype=np.uint8)
+        if array.ndim != 2 or array.shape[1] != 8:
+            raise ValueError("Block array must have shape (N, 8).")
+        blocks = array.view('>u8').reshape(-1).astype(np.uint64)
+        processed = process_block_array(blocks, round_keys)
+        return processed.astype('>u8').view(np.uint8).reshape(-1, 8)
+
+    data = memoryview(data).cast('B')
+    if len(data) % 8 != 0:
+        raise ValueError("Data length must be a multiple of 8 bytes.")
+    if not HAS_NUMPY:
+        if len(data) >= BITSLICE_THRESHOLD:
+            # Imported here: building the S-box circuits costs an exec per
+            # box, which NumPy installs never need.
+            from DES_Bitslice import process_blocks_bitsliced
+            return process_blocks_bitsliced(data, round_keys)
+        return process_blocks_python(data, round_keys)
+
+    blocks = np.frombuffer(data, dtype='>u8').astype(np.uint64)
+    processed = process_block_array(blocks, round_keys)
+    return processed.astype('>u8').tobytes()
+
+def encrypt_blocks(data, key):
+    return process_blocks(data, get_key_schedule(key).encrypt_keys)
+
+def decrypt_blocks(data, key):
+    return process_blocks(data, get_key_schedule(key).decrypt_keys)
@@ -0,0 +1,164 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from DES import (get_key_schedule, key_to_bytes, process_blocks_into, pad_bytes_block,
+                 unpad_bytes, padded_length, encrypt_bytes, decrypt_bytes)
+from DES_Numpy import HAS_NUMPY, process_blocks
+from DES_Modes import cbc_decrypt_blocks, ctr_crypt, check_iv
+
+# Payloads below this many bytes stay on the in-process path.
+PARALLEL_THRESHOLD = 1 << 20
+SHARD_SIZE = 1 << 18
+
+
+def process_shard_blocks(src, dst, round_keys):
+    if HAS_NUMPY:
+        dst[:] = process_blocks(src, round_keys)
+    else:
+        process_blocks_into(src, dst, round_keys)
+
+# Shard handlers get their slice of the input and output, the index of their
+# first block, the mode parameters, and the 8 input bytes just before the
+# shard (None for the first shard).
+
+def ecb_encrypt_shard(src, dst, key, first_block, params, previous):
+    process_shard_blocks(src, dst, get_key_schedule(key).encrypt_keys)
+
+def ecb_decrypt_shard(src, dst, key, first_block, params, previous):
+    process_shard_blocks(src, dst, get_key_schedule(key).decrypt_keys)
+
+def cbc_decrypt_shard(src, dst, key, first_block, params, previous):
+    iv = params if previous is None else previous
+    dst[:] = cbc_decrypt_blocks(src, key, iv)
+
+def ctr_shard(src, dst, key, first_block, params, previous):
+    nonce, offset = params
+    dst[:] = ctr_crypt(src, key, nonce, offset + 8 * first_block)
+
+SHARD_FUNCTIONS = {
+    ('ECB', 'encrypt'): ecb_encrypt_shard,
+    ('ECB', 'decrypt'): ecb_decrypt_shard,
+    ('CBC', 'decrypt'): cbc_decrypt_shard,
+    ('CTR', 'encrypt'): ctr_shard,
+    ('CTR', 'decrypt'): ctr_shard,
+}
+
+# Modes that work on a byte stream rather than whole padded blocks.
+STREAM_MODES = {'CTR'}
+
+
+def run_shard(shm_name, total, start, end, mode, operation, key, params):
+    # Input occupies the first `total` bytes of the segment, output the next.
+    shm = shared_memory.SharedMemory(name=shm_name)
+    views = []
+    try:
+        buf = shm.buf
+        src = buf[start:end]
+        dst = buf[total + start:total + end]
+        views = [src, dst]
+        previous = bytes(buf[start - 8:start]) if start else None
+        SHARD_FUNCTIONS[(mode, operation)](src, dst, key, start // 8, params, previous)
+    finally:
+        # Views still exported would make close() raise BufferError and hide
+        # the shard's own error.
+        for view in views:
+            view.release()
+        shm.close()
+    return end - start
+
+
+_executors = {}
+
+def get_executor(workers):
+    executor = _executors.get(workers)
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        _executors[workers] = executor
+    return executor
+
+def shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown()
+    _executors.clear()
+
+
+def shard_bounds(total, shard_size):
+    shard_size = max(8, shard_size - (shard_size % 8))
+    return [(start, min(start + shard_size, total)) for start in range(0, total, shard_size)]
+
+def process_parallel(blocks, key, mode='ECB', operation='encrypt', params=None,
+                     workers=None, shard_size=SHARD_SIZE, pad=False, unpad=False):
+    # `blocks` is whole 8-byte blocks, except for stream modes which take any
+    # length. pad=True pads while copying the input into shared memory and
+    # unpad=True strips the padding while copying the result out, so the data
+    # is copied once on the way in and once on the way out.
+    blocks = memoryview(blocks).cast('B')
+    total = padded_length(len(blocks)) if pad else len(blocks)
+    if total % 8 != 0 and mode not in STREAM_MODES:
+        raise ValueError("Data length must be a multiple of 8 bytes.")
+    if (mode, operation) not in SHARD_FUNCTIONS:
+        raise ValueError(f"Mode {mode} cannot {operation} in parallel.")
+    if total == 0:
+        return b""
+
+    key = key_to_bytes(key)
+    workers = workers or os.cpu_count() or 1
+    shm = shared_memory.SharedMemory(create=True, size=2 * total)
+    try:
+        full = len(blocks) - (len(blocks) % 8) if pad else total
+        shm.buf[:full] = blocks[:full]
+        if pad:
+            shm.buf[full:total] = pad_bytes_block(blocks[full:])
+        executor = get_executor(workers)
+        futures = [executor.submit(run_shard, shm.name, total, start, end,
+                                   mode, operation, key, params)
+                   for start, end in shard_bounds(total, shard_size)]
+        for future in futures:
+            future.result()
+        # The segment is unlinked below, so the result has to be copied out.
+        output = shm.buf[total:2 * total]
+        try:
+            return bytes(unpad_bytes(output) if unpad else output)
+        finally:
+            output.release()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def encrypt_bytes_parallel(data, key, workers=None, shard_size=SHARD_SIZE,
+                           threshold=PARALLEL_THRESHOLD):
+    data = memoryview(data).cast('B')
+    if len(data) < threshold:
+        return encrypt_bytes(data, key)
+
+    return process_parallel(data, key, 'ECB', 'encrypt', None, workers, shard_size, pad=True)
+
+def decrypt_bytes_parallel(data, key, workers=None, shard_size=SHARD_SIZE,
+                           threshold=PARALLEL_THRESHOLD):
+    data = memoryview(data).cast('B')
+    if len(data) < threshold:
+        return decrypt_bytes(data, key)
+    if len(data) == 0 or len(data) % 8 != 0:
+        raise ValueError("Ciphertext length must be a non-zero multiple of 8 bytes.")
+
+    return process_parallel(data, key, 'ECB', 'decrypt', None, workers, shard_size, unpad=True)
+
+def cbc_decrypt_parallel(data, key, workers=None, shard_size=SHARD_SIZE,
+                         threshold=PARALLEL_THRESHOLD):
+    data = memoryview(data).cast('B')
+    if len(data) < 16 or len(data) % 8 != 0:
+        raise ValueError("CBC ciphertext must hold an IV and whole blocks.")
+    if len(data) < threshold:
+        return unpad_bytes(cbc_decrypt_blocks(data[8:], key, data[:8]))
+
+    iv = bytes(data[:8])
+    return process_parallel(data[8:], key, 'CBC', 'decrypt', iv, workers, shard_size, unpad=True)
+
+def ctr_crypt_parallel(data, key, nonce, offset=0, workers=None, shard_size=SHARD_SIZE,
+                       threshold=PARALLEL_THRESHOLD):
+    nonce = check_iv(nonce)
+    if len(memoryview(data).cast('B')) < threshold:
+        return ctr_crypt(data, key, nonce, offset)
+    return process_parallel(data, key, 'CTR', 'encrypt', (nonce, offset), workers, shard_size)
@@ -0,0 +1,224 @@
+import argparse
+import mmap
+import os
+import sys
+import time
+
+from DES_Modes import (get_cipher, run_blocks, check_iv, cbc_encrypt_blocks,
+                       cbc_decrypt_blocks, ctr_crypt)
+from DES import pad_bytes_block, unpad_bytes
+from DES_Triple import TripleDESSchedule
+import DES_Metrics
+
+CHUNK_SIZE = 1 << 20
+STREAM_MODES = ('ECB', 'CBC', 'CTR')
+
+
+class StreamEncryptor:
+    def __init__(self, key, mode='CBC', iv=None):
+        self.mode = mode.upper()
+        if self.mode not in STREAM_MODES:
+            raise ValueError(f"Unsupported mode: {mode}")
+        self.cipher = get_cipher(key)
+        self.iv = None if self.mode == 'ECB' else check_iv(iv)
+        self.header = self.iv or b""
+        self.buffer = bytearray()
+        self.offset = 0
+        self.finalized = False
+
+    def take_header(self):
+        header, self.header = self.header, b""
+        return header
+
+    def process(self, blocks):
+        if self.mode == 'ECB':
+            return run_blocks(self.cipher, blocks, 'encrypt')
+        out = cbc_encrypt_blocks(blocks, self.cipher, self.iv)
+        if out:
+            self.iv = out[-8:]
+        return out
+
+    def update(self, data):
+        if self.finalized:
+            raise ValueError("Encryptor already finalized.")
+        data = memoryview(data).cast('B')
+        if self.mode == 'CTR':
+            out = ctr_crypt(data, self.cipher, self.iv, self.offset)
+            self.offset += len(data)
+            return self.take_header() + out
+
+        if self.buffer:
+            fill = min(len(data), -len(self.buffer) % 8)
+            self.buffer += data[:fill]
+            data = data[fill:]
+        out = self.take_header()
+        if len(self.buffer) == 8:
+            out += self.process(self.buffer)
+            self.buffer.clear()
+        full = len(data) - (len(data) % 8)
+        if full:
+            out += self.process(data[:full])
+        self.buffer += data[full:]
+        return out
+
+    def finalize(self):
+        if self.finalized:
+            raise ValueError("Encryptor already finalized.")
+        self.finalized = True
+        if self.mode == 'CTR':
+            return self.take_header()
+        out = self.take_header() + self.process(pad_bytes_block(self.buffer))
+        self.buffer.clear()
+        return out
+
+
+class StreamDecryptor:
+    def __init__(self, key, mode='CBC'):
+        self.mode = mode.upper()
+        if self.mode not in STREAM_MODES:
+            raise ValueError(f"Unsupported mode: {mode}")
+        self.cipher = get_cipher(key)
+        self.iv = None
+        self.buffer = bytearray()
+        self.offset = 0
+        self.finalized = False
+
+    def process(self, blocks):
+        if self.mode == 'ECB':
+            return run_blocks(self.cipher, blocks, 'decrypt')
+        out = cbc_decrypt_blocks(blocks, self.cipher, self.iv)
+        self.iv = bytes(blocks[-8:])
+        return out
+
+    def update(self, data):
+        if self.finalized:
+            raise ValueError("Decryptor already finalized.")
+        data = memoryview(data).cast('B')
+        if self.mode != 'ECB' and self.iv is None:
+            need = 8 - len(self.buffer)
+            self.buffer += data[:need]
+            data = data[need:]
+            if len(self.buffer) < 8:
+                return b""
+            self.iv = bytes(self.buffer)
+            self.buffer.clear()
+
+        if self.mode == 'CTR':
+            out = ctr_crypt(data, self.cipher, self.iv, self.offset)
+            self.offset += len(data)
+            return out
+
+        # The last whole block is held back: it carries the padding.
+        self.buffer += data
+        ready = len(self.buffer) - (len(self.buffer) % 8)
+        if ready == len(self.buffer):
+            ready -= 8
+        if ready <= 0:
+            return b""
+        out = self.process(self.buffer[:ready])
+        del self.buffer[:ready]
+        return out
+
+    def finalize(self):
+        if self.finalized:
+            raise ValueError("Decryptor already finalized.")
+        self.finalized = True
+        if self.mode == 'CTR':
+            if self.iv is None:
+                raise ValueError("Ciphertext ended before the nonce.")
+            return b""
+        if len(self.buffer) != 8 or (self.mode != 'ECB' and self.iv is None):
+            raise ValueError("Ciphertext is truncated or not a multiple of 8 bytes.")
+        out = unpad_bytes(self.process(self.buffer))
+        self.buffer.clear()
+        return out
+
+
+def iter_chunks(data, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+def stream_file(stream, input_path, output_path, chunk_size=CHUNK_SIZE):
+    # Written next to the output and renamed over it only once finalize()
+    # succeeds, so bad padding or a truncated input leaves nothing behind.
+    part_path = output_path + ".part"
+    try:
+        with open(input_path, 'rb') as source, open(part_path, 'wb') as target:
+            size = os.fstat(source.fileno()).st_size
+            if size:
+                with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for chunk in iter_chunks(view, chunk_size):
+                            target.write(stream.update(chunk))
+                            chunk.release()
+                    finally:
+                        view.release()
+            target.write(stream.finalize())
+        os.replace(part_path, output_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return size
+
+def get_key():
+    key = ""
+    while len(key) != 8:
+        key = input("Enter your 8-character secret key: ")
+        if len(key) != 8:
+            print("Error: The key must be exactly 8 characters long. Please try again.")
+    return key
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encrypt or decrypt files with DES.")
+    parser.add_argument("action", choices=["encrypt", "decrypt"])
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--key", help="8-character key, 16 or 24 for 3des (prompted for if omitted)")
+    parser.add_argument("--cipher", default="des", choices=["des", "3des"])
+    parser.add_argument("--mode", default="CTR", choices=STREAM_MODES)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--metrics", action="store_true", help="print per-stage cipher timings")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        # Before the key schedules are built, so they are counted too.
+        DES_Metrics.enable()
+
+    if args.cipher == "3des":
+        key = args.key if args.key is not None else input("Enter your 16- or 24-character secret key: ")
+        try:
+            key = TripleDESSchedule(key)
+        except (ValueError, UnicodeEncodeError) as e:
+            print(f"Error: {e}")
+            return 1
+    else:
+        key = args.key if args.key is not None else get_key()
+        if len(key) != 8:
+            print("Error: The key must be exactly 8 characters long.")
+            return 1
+
+    if args.action == "encrypt":
+        stream = StreamEncryptor(key, args.mode)
+    else:
+        stream = StreamDecryptor(key, args.mode)
+
+    start = time.perf_counter()
+    try:
+        total = stream_file(stream, args.input, args.output, args.chunk_size)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    rate = total / elapsed / 1e6 if elapsed > 0 else 0.0
+    print(f"{args.action.capitalize()}ed {total} bytes in {elapsed:.2f}s ({rate:.2f} MB/s)")
+    if args.metrics:
+        DES_Metrics.disable()
+        print(DES_Metrics.format_report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
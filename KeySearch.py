@@ -0,0 +1,306 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from DES import generate_round_keys_int, des_process_int, pad, text_block_to_int
+from DES_Bitslice import (PLANE_BITS, value_planes, key_plane_masks, process_planes)
+
+# Known-plaintext search over restricted keyspaces (CTF exercises): keys are
+# a fixed prefix followed by characters from a charset, like the printable
+# 8-character keys get_key() accepts.
+
+PRINTABLE = bytes(range(32, 127))
+KEY_LENGTH = 8
+# Candidates are tried as bitsliced batches, one key per lane: the batch
+# covers every value of the last few free positions, with the rest fixed.
+MAX_SEARCH_LANES = 1 << 17
+SHARD_SIZE = 1 << 20
+CHECKPOINT_INTERVAL = 5.0
+PROGRESS_INTERVAL = 2.0
+MAX_TEXT_PAIRS = 4
+
+
+class KeySpace:
+    def __init__(self, charset=PRINTABLE, prefix=b""):
+        if len(prefix) > KEY_LENGTH:
+            raise ValueError(f"Prefix is longer than {KEY_LENGTH} characters.")
+        if not charset:
+            raise ValueError("Charset is empty.")
+        self.charset = bytes(charset)
+        self.prefix = bytes(prefix)
+        self.free = KEY_LENGTH - len(self.prefix)
+        # DES drops the low (parity) bit of every key byte, so characters that
+        # differ only in that bit give the same key; try one of each pair.
+        representatives = {}
+        for char in sorted(set(self.charset)):
+            representatives.setdefault(char & 0xFE, char)
+        self.digits = bytes(sorted(representatives.values()))
+        self.size = len(self.digits) ** self.free
+
+        self.batch_positions = 0
+        while (self.batch_positions < self.free
+               and len(self.digits) ** (self.batch_positions + 1) <= MAX_SEARCH_LANES):
+            self.batch_positions += 1
+        self.batch_size = len(self.digits) ** self.batch_positions
+
+    def args(self):
+        return self.charset, self.prefix
+
+    def key_at(self, index):
+        chars = bytearray()
+        for _ in range(self.free):
+            index, digit = divmod(index, len(self.digits))
+            chars.append(self.digits[digit])
+        return self.prefix + bytes(reversed(chars))
+
+    def describe(self):
+        return {'charset': self.charset.hex(), 'prefix': self.prefix.hex()}
+
+
+def key_matches(key, pairs):
+    round_keys = generate_round_keys_int(key)
+    return all(des_process_int(plain, round_keys) == cipher for plain, cipher in pairs)
+
+def batch_key_planes(space):
+    # Planes for the key bytes that vary across a batch (the last
+    # batch_positions of the key); lane k holds the k-th combination.
+    base = len(space.digits)
+    planes = []
+    for pos in range(space.batch_positions):
+        stride = base ** (space.batch_positions - 1 - pos)
+        period = b"".join(bytes([digit]) * stride for digit in space.digits)
+        column = period * (space.batch_size // len(period))
+        for bit in range(8):
+            planes.append(int(column.translate(PLANE_BITS[bit])[::-1], 2))
+    return planes
+
+def search_range(space, pairs, start, end, stop=None):
+    # Tries candidates start..end-1 (both multiples of space.batch_size, or
+    # end == space.size); returns (tested, key bytes or None).
+    lanes = space.batch_size
+    ones = (1 << lanes) - 1
+    plain, cipher = pairs[0]
+    plain_planes = value_planes(plain, ones)
+    cipher_bits = [(cipher >> (63 - i)) & 1 for i in range(64)]
+    varying = batch_key_planes(space)
+    fixed_length = KEY_LENGTH - space.batch_positions
+
+    tested = 0
+    for batch in range(start // lanes, -(-end // lanes)):
+        if stop is not None and stop.is_set():
+            break
+        fixed = space.key_at(batch * lanes)[:fixed_length]
+        key_planes = value_planes(int.from_bytes(fixed, 'big'), ones, 8 * fixed_length) + varying
+        output = process_planes(plain_planes, key_plane_masks(key_planes), ones)
+
+        # Lanes whose ciphertext matches on every bit seen so far.
+        matches = ones
+        for plane, bit in zip(output, cipher_bits):
+            matches &= plane if bit else plane ^ ones
+            if not matches:
+                break
+        while matches:
+            lane = (matches & -matches).bit_length() - 1
+            key = space.key_at(batch * lanes + lane)
+            if key_matches(int.from_bytes(key, 'big'), pairs):
+                return tested + lane + 1, key
+            matches &= matches - 1
+        tested += lanes
+    return tested, None
+
+
+_stop_event = None
+
+def init_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+
+def search_shard(space_args, pairs, shard, start, end):
+    tested, key = search_range(KeySpace(*space_args), pairs, start, end, _stop_event)
+    if key is not None:
+        _stop_event.set()
+    return shard, tested, key
+
+
+class Checkpoint:
+    # Shards below `next_shard` are all done; `done` holds finished shards
+    # above it (they complete out of order).
+    def __init__(self, path, params):
+        self.path = path
+        self.params = params
+        self.next_shard = 0
+        self.done = set()
+        self.tested = 0
+        self.found = None
+        self.last_saved = time.monotonic()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            state = json.load(f)
+        if state.get('params') != self.params:
+            raise ValueError(f"Checkpoint {self.path} is for a different search.")
+        self.next_shard = state['next_shard']
+        self.done = set(state['done'])
+        self.tested = state['tested']
+        self.found = bytes.fromhex(state['found']) if state.get('found') else None
+        return True
+
+    def mark_done(self, shard, tested):
+        self.tested += tested
+        self.done.add(shard)
+        while self.next_shard in self.done:
+            self.done.remove(self.next_shard)
+            self.next_shard += 1
+
+    def is_done(self, shard):
+        return shard < self.next_shard or shard in self.done
+
+    def save(self, force=False):
+        if not self.path or (not force and time.monotonic() - self.last_saved < CHECKPOINT_INTERVAL):
+            return
+        state = {
+            'params': self.params,
+            'next_shard': self.next_shard,
+            'done': sorted(self.done),
+            'tested': self.tested,
+            'found': self.found.hex() if self.found else None,
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.path)
+        self.last_saved = time.monotonic()
+
+
+def search(space, pairs, workers=None, checkpoint_path=None, shard_size=SHARD_SIZE,
+           progress=print):
+    # Returns (key bytes or None, candidates tested this run, seconds).
+    workers = workers or os.cpu_count() or 1
+    shard_size = max(1, shard_size // space.batch_size) * space.batch_size
+    shard_count = -(-space.size // shard_size)
+    params = {'space': space.describe(), 'shard_size': shard_size,
+              'pairs': [[f"{plain:016x}", f"{cipher:016x}"] for plain, cipher in pairs]}
+    checkpoint = Checkpoint(checkpoint_path, params)
+    if checkpoint.load():
+        progress(f"Resuming from {checkpoint_path}: {checkpoint.tested} candidates already tested.")
+        if checkpoint.found is not None:
+            return checkpoint.found, 0, 0.0
+
+    stop = multiprocessing.Event()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(stop,))
+    pending = set()
+    next_shard = checkpoint.next_shard
+    tested = 0
+    start_time = last_report = time.monotonic()
+    try:
+        while True:
+            while len(pending) < 2 * workers and next_shard < shard_count and not stop.is_set():
+                if not checkpoint.is_done(next_shard):
+                    start = next_shard * shard_size
+                    end = min(start + shard_size, space.size)
+                    pending.add(executor.submit(search_shard, space.args(), pairs,
+                                                next_shard, start, end))
+                next_shard += 1
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                shard, shard_tested, key = future.result()
+                tested += shard_tested
+                if key is not None:
+                    checkpoint.found = key
+                    checkpoint.tested += shard_tested
+                elif not stop.is_set():
+                    checkpoint.mark_done(shard, shard_tested)
+            checkpoint.save(force=checkpoint.found is not None)
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                rate = tested / (now - start_time)
+                progress(f"{checkpoint.tested}/{space.size} candidates tested ({rate:,.0f}/s)")
+                last_report = now
+    except KeyboardInterrupt:
+        stop.set()
+        progress("Interrupted; saving checkpoint.")
+        raise
+    finally:
+        stop.set()
+        executor.shutdown(cancel_futures=True)
+        checkpoint.save(force=True)
+    return checkpoint.found, tested, time.monotonic() - start_time
+
+
+def parse_pair(text):
+    plain, _, cipher = text.partition(":")
+    plain, cipher = bytes.fromhex(plain), bytes.fromhex(cipher)
+    if len(plain) != 8 or len(cipher) != 8:
+        raise ValueError(f"Pair {text!r} must be two 8-byte hex blocks.")
+    return int.from_bytes(plain, 'big'), int.from_bytes(cipher, 'big')
+
+def pairs_from_message(plaintext, ciphertext_hex):
+    # A chat message gives one pair per block: des_encrypt pads the text and
+    # encrypts it block by block.
+    padded = pad(plaintext)
+    cipher = bytes.fromhex(ciphertext_hex.strip())
+    count = min(len(padded), len(cipher)) // 8
+    if count == 0:
+        raise ValueError("Ciphertext is shorter than one block.")
+    return [(text_block_to_int(padded[8 * i:8 * i + 8]), int.from_bytes(cipher[8 * i:8 * i + 8], 'big'))
+            for i in range(min(count, MAX_TEXT_PAIRS))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Known-plaintext DES key search.")
+    parser.add_argument("--pair", action="append", default=[],
+                        help="PLAINTEXT_HEX:CIPHERTEXT_HEX for one 8-byte block (repeatable)")
+    parser.add_argument("--plaintext", help="known message text, as typed into the chat")
+    parser.add_argument("--ciphertext", help="the chat's hex ciphertext for --plaintext")
+    parser.add_argument("--charset", default=PRINTABLE.decode('ascii'),
+                        help="characters allowed after the prefix (default: printable ASCII)")
+    parser.add_argument("--prefix", default="", help="known start of the key")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--checkpoint", help="file to save progress to and resume from")
+    args = parser.parse_args(argv)
+
+    try:
+        pairs = [parse_pair(pair) for pair in args.pair]
+        if args.plaintext is not None or args.ciphertext is not None:
+            if args.plaintext is None or args.ciphertext is None:
+                raise ValueError("--plaintext and --ciphertext go together.")
+            pairs += pairs_from_message(args.plaintext, args.ciphertext)
+        if not pairs:
+            raise ValueError("Give at least one --pair or --plaintext/--ciphertext.")
+        space = KeySpace(args.charset.encode('latin-1'), args.prefix.encode('latin-1'))
+    except (ValueError, UnicodeEncodeError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"Searching {space.size:,} candidates ({len(space.digits)} characters per position "
+          f"after parity folding, {space.free} free positions) with {args.workers} workers...")
+    try:
+        key, tested, elapsed = search(space, pairs, args.workers, args.checkpoint, args.shard_size)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    except KeyboardInterrupt:
+        return 1
+
+    rate = tested / elapsed if elapsed > 0 else 0.0
+    print(f"Tested {tested:,} candidates in {elapsed:.2f}s ({rate:,.0f}/s).")
+    if key is None:
+        print("No key found.")
+        return 1
+    print(f"Key found: {key.decode('latin-1')!r} (hex {key.hex()})")
+    print("Keys that differ only in the low bit of any byte are equivalent.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
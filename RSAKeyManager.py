@@ -0,0 +1,130 @@
+import os
+import queue
+import threading
+import time
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import serialization
+
+KEY_SIZE = 2048
+POOL_SIZE = 2
+MAX_KEY_AGE = 3600.0
+MAX_KEY_USES = 100
+
+
+def generate_keypair(key_size=KEY_SIZE):
+    return rsa.generate_private_key(
+        public_exponent=65537,
+        key_size=key_size,
+    )
+
+def public_pem_for(private_key):
+    return private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+def load_private_key(path):
+    with open(path, 'rb') as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+def save_private_key(path, private_key):
+    pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    # Write next to the target and rename, so a crash never leaves half a key.
+    temp_path = f"{path}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pem)
+    os.replace(temp_path, path)
+
+
+class RSAKeyManager:
+    def __init__(self, pool_size=POOL_SIZE, key_size=KEY_SIZE, key_path=None,
+                 max_age=MAX_KEY_AGE, max_uses=MAX_KEY_USES):
+        # max_age / max_uses of None disable that rotation trigger.
+        self.key_size = key_size
+        self.key_path = key_path
+        self.max_age = max_age
+        self.max_uses = max_uses
+        self.pool = queue.Queue(maxsize=max(1, pool_size))
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.filler = None
+        self.current = None
+        self.current_pem = None
+        self.created = 0.0
+        self.uses = 0
+        self.rotations = 0
+
+    def start(self):
+        if self.key_path and os.path.exists(self.key_path):
+            try:
+                self.install(load_private_key(self.key_path),
+                             os.path.getmtime(self.key_path))
+            except (OSError, ValueError) as e:
+                print(f"Could not load RSA key from {self.key_path}: {e}")
+        if self.filler is None:
+            self.filler = threading.Thread(target=self.fill_pool, daemon=True)
+            self.filler.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def fill_pool(self):
+        while not self.stopped.is_set():
+            private_key = generate_keypair(self.key_size)
+            while not self.stopped.is_set():
+                try:
+                    self.pool.put(private_key, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def install(self, private_key, created=None):
+        self.current = private_key
+        self.current_pem = public_pem_for(private_key)
+        # Wall-clock time, so a reloaded key keeps its age across restarts.
+        self.created = time.time() if created is None else created
+        self.uses = 0
+
+    def expired(self):
+        if self.current is None:
+            return True
+        if self.max_uses is not None and self.uses >= self.max_uses:
+            return True
+        return self.max_age is not None and time.time() - self.created >= self.max_age
+
+    def rotate(self):
+        try:
+            private_key = self.pool.get_nowait()
+        except queue.Empty:
+            private_key = generate_keypair(self.key_size)
+        self.install(private_key)
+        self.rotations += 1
+        if self.key_path:
+            try:
+                save_private_key(self.key_path, private_key)
+            except OSError as e:
+                print(f"Could not save RSA key to {self.key_path}: {e}")
+
+    def acquire(self):
+        # Returns (private_key, public_pem) for one handshake.
+        with self.lock:
+            if self.expired():
+                self.rotate()
+            self.uses += 1
+            return self.current, self.current_pem
+
+    def info(self):
+        with self.lock:
+            return {
+                'pooled': self.pool.qsize(),
+                'uses': self.uses,
+                'age': time.time() - self.created if self.current is not None else None,
+                'rotations': self.rotations,
+            }
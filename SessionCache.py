@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL = 600.0
+MAX_SESSIONS = 256
+SESSION_ID_SIZE = 16
+
+# A resume request is padded to exactly one RSA block, so a receiver reads
+# the same number of bytes whether it gets a wrapped key or a session ID.
+RESUME_MAGIC = b"DESRESUM"
+RESUMED_WORD = b"resumed"
+RESUME_FAILED_WORD = b"resume-failed"
+SESSION_WORD_PREFIX = b"session="
+
+
+class SessionCache:
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+
+    def put(self, name, value):
+        with self.lock:
+            self.entries[name] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(name)
+            while len(self.entries) > self.max_sessions:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get(self, name):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            value, expires = entry
+            if time.monotonic() >= expires:
+                del self.entries[name]
+                self.stats['expired'] += 1
+                return None
+            self.entries.move_to_end(name)
+            self.stats['hits'] += 1
+            return value
+
+    def remove(self, name):
+        with self.lock:
+            self.entries.pop(name, None)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self.lock:
+            for name in [name for name, (_, expires) in self.entries.items() if expires <= now]:
+                del self.entries[name]
+                self.stats['expired'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def info(self):
+        with self.lock:
+            info = dict(self.stats)
+            info['size'] = len(self.entries)
+            info['maxsize'] = self.max_sessions
+        return info
+
+
+def new_session_id():
+    return os.urandom(SESSION_ID_SIZE)
+
+def make_resume_request(session_id, size):
+    request = RESUME_MAGIC + session_id
+    return request + bytes(size - len(request))
+
+def parse_resume_request(block):
+    block = bytes(block)
+    if not block.startswith(RESUME_MAGIC):
+        return None
+    return block[len(RESUME_MAGIC):len(RESUME_MAGIC) + SESSION_ID_SIZE]
+
+def session_word(session_id):
+    return SESSION_WORD_PREFIX + session_id.hex().encode('ascii')
+
+def session_id_from_words(words):
+    for word in words:
+        if word.startswith(SESSION_WORD_PREFIX):
+            try:
+                return bytes.fromhex(word[len(SESSION_WORD_PREFIX):].decode('ascii'))
+            except ValueError:
+                return None
+    return None